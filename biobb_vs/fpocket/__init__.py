@@ -1,5 +1,9 @@
 from . import fpocket_run
 from . import fpocket_filter
 from . import fpocket_select
+from . import fpocket_query
+from . import fpocket_ensemble
+from . import fpocket_geometry
+from . import fpocket_sweep
 name = "fpocket"
-__all__ = ["fpocket_run", "fpocket_filter", "fpocket_select"]
+__all__ = ["fpocket_run", "fpocket_filter", "fpocket_select", "fpocket_query", "fpocket_ensemble", "fpocket_geometry", "fpocket_sweep"]
@@ -1,8 +1,59 @@
 """ Common functions for package biobb_vs.fpocket """
 from pathlib import Path, PurePath
+import ast
+import functools
+import hashlib
 import json
+import os
+import operator
 import re
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+import numpy as np
+from Bio.PDB.kdtrees import KDTree  # type: ignore
+from biobb_common.command_wrapper import cmd_wrapper
 from biobb_common.tools import file_utils as fu
+from biobb_vs.utils.common import read_pqr_records, search_neighbor_pairs
+
+
+POCKET_MEMBER_RE = re.compile(r'(pocket\d+)_')
+
+# descriptors of each pocket in the fpocket summary, in the order fpocket writes them
+FPOCKET_DESCRIPTORS = [
+    ('score', np.float64),
+    ('druggability_score', np.float64),
+    ('number_of_alpha_spheres', np.int64),
+    ('total_sasa', np.float64),
+    ('polar_sasa', np.float64),
+    ('apolar_sasa', np.float64),
+    ('volume', np.float64),
+    ('mean_local_hydrophobic_density', np.float64),
+    ('mean_alpha_sphere_radius', np.float64),
+    ('mean_alp_sph_solvent_access', np.float64),
+    ('apolar_alpha_sphere_proportion', np.float64),
+    ('hydrophobicity_score', np.float64),
+    ('volume_score', np.float64),
+    ('polarity_score', np.int64),
+    ('charge_score', np.int64),
+    ('proportion_of_polar_atoms', np.float64),
+    ('alpha_sphere_density', np.float64),
+    ('cent_of_mass_alpha_sphere_max_dist', np.float64),
+    ('flexibility', np.float64)
+]
+FPOCKET_DESCRIPTOR_TYPES = dict(FPOCKET_DESCRIPTORS)
+
+INFO_POCKET_RE = re.compile(r'\d+')
+INFO_KEY_STRIP_RE = re.compile(r'\-|\.')
+INFO_KEY_SPACES_RE = re.compile(r'\s+')
+
+# indexed columns of the pockets database
+POCKETS_DB_INDEXES = ['structure', 'score', 'druggability_score', 'volume']
+
+# files of each entry of the fpocket cache
+CACHE_POCKETS_ZIP = 'pockets.zip'
+CACHE_SUMMARY = 'summary.json'
 
 
 # CHECK PARAMETERS
@@ -43,7 +94,14 @@ def is_valid_file(ext, argument):
         'input_summary': ['json'],
         'output_filter_pockets_zip': ['zip'],
         'output_pocket_pdb': ['pdb'],
-        'output_pocket_pqr': ['pqr']
+        'output_pocket_pqr': ['pqr'],
+        'input_pockets_db': ['db', 'sqlite'],
+        'output_query_summary': ['json'],
+        'input_ensemble_path': ['pdb', 'zip'],
+        'output_ensemble_npz': ['npz'],
+        'output_geometry': ['json'],
+        'output_sweep_summary': ['json'],
+        'output_sweep_pockets_zip': ['zip']
     }
     return ext in formats[argument]
 
@@ -64,15 +122,329 @@ def check_range(name, property, values, out_log, classname):
     return property
 
 
+def check_query(query, out_log, classname):
+    """ Checks the format of the query expressions for fpocket_filter """
+
+    queries = [query] if isinstance(query, str) else query
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        fu.log(classname + ': Incorrect format for query property, exiting', out_log)
+        raise SystemExit(classname + ': Incorrect format for query property, exiting')
+
+    names = [name for name, _ in FPOCKET_DESCRIPTORS]
+    for q in queries:
+        try:
+            compile_expression(q, names)
+        except (SyntaxError, ValueError) as e:
+            fu.log(classname + ': Wrong query %s: %s, exiting' % (q, e), out_log)
+            raise SystemExit(classname + ': Wrong query %s: %s, exiting' % (q, e))
+
+    return queries
+
+
+def check_sort_by(sort_by, out_log, classname):
+    """ Checks that sort_by is one of the fpocket descriptors """
+
+    if sort_by not in FPOCKET_DESCRIPTOR_TYPES:
+        fu.log(classname + ': Incorrect value for sort_by property: %s, exiting' % sort_by, out_log)
+        raise SystemExit(classname + ': Incorrect value for sort_by property: %s, exiting' % sort_by)
+
+    return sort_by
+
+
+def check_sort_keys(sort_by, out_log, classname):
+    """ Checks the format of the sort_by keys for fpocket_run, either descriptors or expressions over them """
+
+    keys = [sort_by] if isinstance(sort_by, str) else sort_by
+    if not isinstance(keys, list) or not keys or not all(isinstance(k, str) for k in keys):
+        fu.log(classname + ': Incorrect format for sort_by property, exiting', out_log)
+        raise SystemExit(classname + ': Incorrect format for sort_by property, exiting')
+
+    names = [name for name, _ in FPOCKET_DESCRIPTORS]
+    for k in keys:
+        try:
+            compile_expression(k, names)
+        except (SyntaxError, ValueError) as e:
+            fu.log(classname + ': Incorrect value for sort_by property: %s: %s, exiting' % (k, e), out_log)
+            raise SystemExit(classname + ': Incorrect value for sort_by property: %s: %s, exiting' % (k, e))
+
+    return keys
+
+
+# SUMMARY QUERIES
+
+def summary_to_array(data):
+    """ Loads an fpocket summary dictionary into a NumPy structured array with one row per pocket """
+
+    table = np.zeros(len(data), dtype=[('pocket', 'U16')] + FPOCKET_DESCRIPTORS)
+    table['pocket'] = list(data.keys())
+    for name, dtype in FPOCKET_DESCRIPTORS:
+        missing = -1 if dtype is np.int64 else np.nan
+        table[name] = [pocket.get(name, missing) for pocket in data.values()]
+
+    return table
+
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow
+}
+
+_SQL_OPS = {
+    ast.Add: '+',
+    ast.Sub: '-',
+    ast.Mult: '*',
+    ast.Gt: '>',
+    ast.GtE: '>=',
+    ast.Lt: '<',
+    ast.LtE: '<=',
+    ast.Eq: '=',
+    ast.NotEq: '!='
+}
+
+_CMP_OPS = {
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne
+}
+
+
+def compile_expression(expression, names):
+    """ Parses an expression over the given column names and returns its validated syntax tree.
+    Only numbers, column names, arithmetic (+ - * / **), comparisons and the and / or / not operators are allowed """
+
+    tree = ast.parse(expression.strip(), mode='eval')
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if node.id not in names:
+                raise ValueError('unknown descriptor %s' % node.id)
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError('only numeric constants are allowed')
+        elif isinstance(node, ast.BinOp):
+            if type(node.op) not in _BIN_OPS:
+                raise ValueError('operator %s not allowed' % type(node.op).__name__)
+        elif isinstance(node, ast.Compare):
+            if not all(type(op) in _CMP_OPS for op in node.ops):
+                raise ValueError('comparison not allowed')
+        elif isinstance(node, ast.UnaryOp):
+            if not isinstance(node.op, (ast.USub, ast.UAdd, ast.Not)):
+                raise ValueError('operator %s not allowed' % type(node.op).__name__)
+        elif not isinstance(node, (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.Load) + tuple(_BIN_OPS) + tuple(_CMP_OPS) + (ast.USub, ast.UAdd, ast.Not)):
+            raise ValueError('%s not allowed' % type(node).__name__)
+
+    return tree
+
+
+def _evaluate_node(node, table):
+    """ Evaluates a validated syntax tree node over the columns of table """
+
+    if isinstance(node, ast.Expression):
+        return _evaluate_node(node.body, table)
+    if isinstance(node, ast.Name):
+        return table[node.id]
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.BinOp):
+        return _BIN_OPS[type(node.op)](_evaluate_node(node.left, table), _evaluate_node(node.right, table))
+    if isinstance(node, ast.UnaryOp):
+        operand = _evaluate_node(node.operand, table)
+        if isinstance(node.op, ast.Not):
+            return np.logical_not(operand)
+        return -operand if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.BoolOp):
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        result = _evaluate_node(node.values[0], table)
+        for value in node.values[1:]:
+            result = combine(result, _evaluate_node(value, table))
+        return result
+    # chained comparisons: a < b < c is evaluated as (a < b) and (b < c)
+    result = np.ones(len(table), dtype=bool)
+    left = _evaluate_node(node.left, table)
+    for op, comparator in zip(node.ops, node.comparators):
+        right = _evaluate_node(comparator, table)
+        result &= _CMP_OPS[type(op)](left, right)
+        left = right
+    return result
+
+
+def evaluate_expression(table, expression):
+    """ Evaluates an expression over all the rows of a structured array at once """
+
+    names = [name for name in table.dtype.names if table.dtype[name].kind in 'fiu']
+    tree = compile_expression(expression, names)
+    return np.broadcast_to(_evaluate_node(tree, table), len(table))
+
+
+def expression_to_sql(expression, names):
+    """ Translates a validated expression over the given column names into an SQL WHERE clause """
+
+    def to_sql(node):
+        if isinstance(node, ast.Expression):
+            return to_sql(node.body)
+        if isinstance(node, ast.Name):
+            return '"%s"' % node.id
+        if isinstance(node, ast.Constant):
+            return repr(node.value)
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.Pow):
+                raise ValueError('operator Pow not allowed in database queries')
+            if isinstance(node.op, ast.Div):
+                # true division, as in evaluate_expression, also between INTEGER columns
+                return '(CAST(%s AS REAL) / %s)' % (to_sql(node.left), to_sql(node.right))
+            return '(%s %s %s)' % (to_sql(node.left), _SQL_OPS[type(node.op)], to_sql(node.right))
+        if isinstance(node, ast.UnaryOp):
+            return '(%s%s)' % ({ast.Not: 'NOT ', ast.USub: '-', ast.UAdd: '+'}[type(node.op)], to_sql(node.operand))
+        if isinstance(node, ast.BoolOp):
+            return '(%s)' % (' AND ' if isinstance(node.op, ast.And) else ' OR ').join(to_sql(v) for v in node.values)
+        operands = [to_sql(node.left)] + [to_sql(c) for c in node.comparators]
+        return '(%s)' % ' AND '.join('%s %s %s' % (operands[i], _SQL_OPS[type(op)], operands[i + 1]) for i, op in enumerate(node.ops))
+
+    return to_sql(compile_expression(expression, names))
+
+
+def query_summary(table, queries):
+    """ Returns the boolean mask of the rows of table fulfilling all the queries """
+
+    mask = np.ones(len(table), dtype=bool)
+    for query in queries:
+        mask &= evaluate_expression(table, query).astype(bool)
+
+    return mask
+
+
+# POCKETS DATABASE
+
+def open_pockets_db(db_path):
+    """ Opens the SQLite pockets database, creating the pockets table and its indexes if needed """
+
+    conn = sqlite3.connect(str(db_path), timeout=60)
+    columns = ', '.join('"%s" %s' % (name, 'INTEGER' if dtype is np.int64 else 'REAL') for name, dtype in FPOCKET_DESCRIPTORS)
+    conn.execute('CREATE TABLE IF NOT EXISTS pockets (structure TEXT NOT NULL, pocket TEXT NOT NULL, %s, PRIMARY KEY (structure, pocket))' % columns)
+    for column in POCKETS_DB_INDEXES:
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_pockets_%s ON pockets ("%s")' % (column, column))
+
+    return conn
+
+
+def store_pockets(db_path, data, structure):
+    """ Appends the pockets of an fpocket summary dictionary of the given structure to the SQLite pockets database.
+    Missing descriptors are stored as NULL, so that they do not fulfil any query.
+    Pockets already stored for the same structure are replaced """
+
+    names = [name for name, _ in FPOCKET_DESCRIPTORS]
+    rows = [(structure, pocket) + tuple(descriptors.get(name) for name in names) for pocket, descriptors in data.items()]
+    conn = open_pockets_db(db_path)
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO pockets VALUES (%s)' % ', '.join(['?'] * (len(names) + 2)), rows)
+    conn.close()
+
+
+def query_pockets_db(db_path, structures=None, queries=None, sort_by='druggability_score', top_k=0):
+    """ Returns a structured array with the pockets of the SQLite pockets database belonging to structures and fulfilling all the queries,
+    sorted by sort_by and limited to the top_k best ones (all of them if top_k is 0) """
+
+    names = [name for name, _ in FPOCKET_DESCRIPTORS]
+    where = []
+    params = []
+    if structures:
+        where.append('structure IN (%s)' % ', '.join(['?'] * len(structures)))
+        params.extend(structures)
+    for query in queries or []:
+        where.append(expression_to_sql(query, names))
+
+    sql = 'SELECT structure, pocket, %s FROM pockets' % ', '.join('"%s"' % name for name in names)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY "%s" DESC, structure, pocket' % sort_by
+    if top_k:
+        sql += ' LIMIT %d' % int(top_k)
+
+    conn = open_pockets_db(db_path)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+
+    # missing descriptors are stored as NULL, returned as NaN or as -1 for the integer ones
+    missing = ('', '') + tuple(-1 if dtype is np.int64 else np.nan for _, dtype in FPOCKET_DESCRIPTORS)
+    rows = [tuple(m if v is None else v for v, m in zip(row, missing)) for row in rows]
+
+    return np.array(rows, dtype=[('structure', 'U256'), ('pocket', 'U16')] + FPOCKET_DESCRIPTORS)
+
+
+# PARSE FPOCKET INFO FILES
+
+@functools.lru_cache(maxsize=None)
+def _info_key(label):
+    """ Normalizes an fpocket info label (ie: Cent. of mass - Alpha Sphere max dist) to its summary key (ie: cent_of_mass_alpha_sphere_max_dist) """
+    key = INFO_KEY_STRIP_RE.sub('', label.lower().strip())
+    return INFO_KEY_SPACES_RE.sub('_', key)
+
+
+def parse_fpocket_info(info_path):
+    """ Parses an fpocket _info.txt file into a dictionary with the descriptors of each pocket """
+
+    data = {}
+    pocket = {}
+    with open(info_path, 'r') as info_text:
+        for line in info_text:
+            if not line.strip():
+                continue
+            if not line.startswith('\t'):
+                # first level: pocket
+                pocket = {}
+                data['pocket' + INFO_POCKET_RE.search(line).group()] = pocket  # type: ignore
+                continue
+            # second level: pocket properties
+            label, _, value = line.rpartition(':')
+            key = _info_key(label)
+            dtype = FPOCKET_DESCRIPTOR_TYPES.get(key)
+            if dtype is np.float64:
+                pocket[key] = float(value)
+            elif dtype is np.int64:
+                pocket[key] = int(value)
+            else:
+                # descriptor not in FPOCKET_DESCRIPTORS, infer its type
+                pocket[key] = float(value) if '.' in value else int(value)
+
+    return data
+
+
+def parse_fpocket_info_bulk(info_paths):
+    """ Parses several fpocket _info.txt files into a single structured array with one row per pocket.
+    The structure field holds the index of the info file in info_paths """
+
+    dtype = [('structure', np.int32), ('pocket', 'U16')] + FPOCKET_DESCRIPTORS
+    missing = [-1 if t is np.int64 else np.nan for _, t in FPOCKET_DESCRIPTORS]
+    rows = []
+    for structure, info_path in enumerate(info_paths):
+        for pocket, values in parse_fpocket_info(info_path).items():
+            rows.append((structure, pocket) + tuple(values.get(name, m) for (name, _), m in zip(FPOCKET_DESCRIPTORS, missing)))
+
+    return np.array(rows, dtype=dtype)
+
+
 # PROCESS OUTPUTS
 
-def process_output_fpocket(tmp_folder, output_pockets_zip, output_summary, sort_by, remove_tmp, container_path, out_log, classname):
-    """ Creates the output_pockets_zip and generates the  output_summary """
+def get_fpocket_output(tmp_folder, container_path):
+    """ Returns the fpocket output folder and its info file inside tmp_folder """
 
     if container_path:
-        path = str(PurePath(tmp_folder).joinpath('fpocket_input_out'))
-    else:
-        path = str(PurePath(tmp_folder).joinpath('input_out'))
+        path = PurePath(tmp_folder).joinpath('fpocket_input_out')
+        return path, path.joinpath('fpocket_input_info.txt')
+
+    path = PurePath(tmp_folder).joinpath('input_out')
+    return path, path.joinpath('input_info.txt')
+
+
+def process_output_fpocket(tmp_folder, output_pockets_zip, output_summary, sort_by, remove_tmp, container_path, out_log, classname, top_k=0):
+    """ Creates the output_pockets_zip and generates the  output_summary """
+
+    path, info = get_fpocket_output(tmp_folder, container_path)
 
     if not Path(path).is_dir():
         if remove_tmp:
@@ -84,44 +456,26 @@ def process_output_fpocket(tmp_folder, output_pockets_zip, output_summary, sort_
         raise SystemExit(classname + ': Error executing fpocket, please check your properties')
 
     # summary
-    # read input_info.txt file
-    if container_path:
-        info = PurePath(path).joinpath('fpocket_input_info.txt')
-    else:
-        info = PurePath(path).joinpath('input_info.txt')
-    with open(info, 'r') as info_text:
-        lines = info_text.readlines()
-        lines = [x for x in lines if x != '\n']
-
-    data = {}
-
     # parse input_info.txt file to python object
-    pocket = ''
-    for line in lines:
-        if not line.startswith('\t'):
-            # first level: pocket
-            num = re.findall('\\d+', line)[0]
-            pocket = 'pocket' + num
-            data[pocket] = {}
-        else:
-            # second level: pocket properties
-            groups = re.findall('(.*)(?:\\ *\\:\\ *)(.*)', line)[0]
-            key = groups[0].lower().strip()
-            key = re.sub(r'\-|\.', '', key)
-            key = re.sub(r'\s+', '_', key)
-            value = float(groups[1]) if '.' in groups[1] else int(groups[1])
-            data[pocket][key] = value
+    data = parse_fpocket_info(info)
 
     # get number of pockets
     fu.log('%d pockets found' % (len(data)), out_log)
 
     # sort data by sort_by property
     fu.log('Sorting output data by %s' % (sort_by), out_log)
-    data = dict(sorted(data.items(), key=lambda item: float(item[1][sort_by]), reverse=True))
+    num_pockets = len(data)
+    data = rank_summary(data, sort_by, top_k)
+    if len(data) < num_pockets:
+        fu.log('Keeping the top %d pockets' % (len(data)), out_log)
 
-    # compress pockets
+    # compress pockets, only the kept ones
     pockets = PurePath(path).joinpath('pockets')
-    files_list = [str(i) for i in Path(pockets).iterdir()]
+    files_list = []
+    for i in Path(pockets).iterdir():
+        match = POCKET_MEMBER_RE.match(i.name)
+        if len(data) == num_pockets or (match and match.group(1) in data):
+            files_list.append(str(i))
     fu.zip_list(zip_file=output_pockets_zip, file_list=files_list, out_log=out_log)
 
     # save summary
@@ -134,25 +488,421 @@ def process_output_fpocket(tmp_folder, output_pockets_zip, output_summary, sort_
         fu.rm(tmp_folder)
         fu.log('Removed temporary folder: %s' % tmp_folder, out_log)'''
 
+    return data
 
-def process_output_fpocket_filter(search_list, tmp_folder, input_pockets_zip, output_filter_pockets_zip, remove_tmp, out_log):
-    """ Creates the output_filter_pockets_zip """
 
-    # decompress the input_pockets_zip file to tmp_folder
-    fu.unzip_list(zip_file=input_pockets_zip, dest_dir=tmp_folder, out_log=out_log)
+def rank_summary(data, sort_by, top_k=0):
+    """ Ranks the pockets of an fpocket summary dictionary by the sort_by keys, descriptors or expressions over them, in decreasing order.
+    Every key breaks the ties of the previous ones and the pocket number breaks the remaining ties.
+    Returns the top_k best pockets, or all of them if top_k is 0 """
 
-    # list all files of tmp_folder
-    pockets_list = [str(i) for i in Path(tmp_folder).iterdir()]
+    keys = [sort_by] if isinstance(sort_by, str) else sort_by
+    table = summary_to_array(data)
+    numbers = np.array([int(INFO_POCKET_RE.search(name).group()) for name in table['pocket']], dtype=np.int64)
+    # negated so that the best pockets come first, NaN values last
+    columns = [-np.asarray(evaluate_expression(table, key), dtype=np.float64) for key in keys]
 
-    # select search_list items from pockets_list
-    sel_pockets_list = [p for p in pockets_list for s in search_list if s + '_' in p]
+    candidates = np.arange(len(table))
+    if 0 < top_k < len(table):
+        # partial selection on the first key: only the pockets not worse than the top_k-th one (ties included) are fully sorted
+        kth = np.partition(columns[0], top_k - 1)[top_k - 1]
+        if not np.isnan(kth):
+            candidates = np.flatnonzero(columns[0] <= kth)
 
-    fu.log('Creating %s output file' % output_filter_pockets_zip, out_log)
+    order = candidates[np.lexsort([numbers[candidates]] + [column[candidates] for column in reversed(columns)])]
+    if top_k:
+        order = order[:top_k]
 
-    # compress output to output_filter_pockets_zip
-    fu.zip_list(zip_file=output_filter_pockets_zip, file_list=sel_pockets_list, out_log=out_log)
+    pockets = list(data)
+    return {pockets[i]: data[pockets[i]] for i in order}
 
-    '''if remove_tmp:
-        # remove temporary folder
-        fu.rm(tmp_folder)
-        fu.log('Removed temporary folder: %s' % tmp_folder, out_log)'''
+
+# FPOCKET CACHE
+
+@functools.lru_cache(maxsize=None)
+def get_fpocket_version(binary_path):
+    """ Identifies the fpocket executable by the hash of its contents, as fpocket does not report its version """
+
+    path = shutil.which(binary_path)
+    if not path:
+        return binary_path
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(functools.partial(f.read, 1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def get_cache_key(input_pdb_path, min_radius, max_radius, num_spheres, version):
+    """ Returns the key of the fpocket cache entry for the given structure, parameters and fpocket version """
+
+    digest = hashlib.sha256()
+    with open(input_pdb_path, 'rb') as f:
+        for chunk in iter(functools.partial(f.read, 1 << 20), b''):
+            digest.update(chunk)
+
+    params = [None if min_radius is None else float(min_radius),
+              None if max_radius is None else float(max_radius),
+              None if num_spheres is None else int(num_spheres),
+              version]
+    digest.update(json.dumps(params).encode())
+
+    return digest.hexdigest()
+
+
+def restore_cached_fpocket(cache_path, key, output_pockets_zip, output_summary, sort_by, out_log, top_k=0):
+    """ Restores the output_pockets_zip and the output_summary from the fpocket cache.
+    Returns the ranked summary dictionary or None if the entry is not in the cache """
+
+    entry = Path(cache_path).joinpath(key)
+    try:
+        with open(entry.joinpath(CACHE_SUMMARY)) as f:
+            data = json.load(f)
+        # mark the entry as recently used
+        os.utime(entry)
+    except (OSError, ValueError):
+        return None
+
+    fu.log('%d pockets restored from %s cache entry' % (len(data), entry), out_log)
+
+    # sort data by sort_by property
+    fu.log('Sorting output data by %s' % (sort_by), out_log)
+    num_pockets = len(data)
+    data = rank_summary(data, sort_by, top_k)
+
+    # the cache keeps all the pockets, archive only the kept ones
+    try:
+        if len(data) < num_pockets:
+            fu.log('Keeping the top %d pockets' % (len(data)), out_log)
+            process_output_fpocket_filter(list(data), str(entry.joinpath(CACHE_POCKETS_ZIP)), output_pockets_zip, out_log)
+        else:
+            shutil.copyfile(entry.joinpath(CACHE_POCKETS_ZIP), output_pockets_zip)
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+    # save summary
+    fu.log('Saving summary to %s file' % (output_summary), out_log)
+    with open(output_summary, 'w') as outfile:
+        json.dump(data, outfile, indent=4)
+
+    return data
+
+
+def store_cached_fpocket(cache_path, key, tmp_folder, container_path, cache_max_size, out_log):
+    """ Stores all the pockets and the summary of the fpocket output in tmp_folder in the fpocket cache and evicts the least recently used entries
+    until the cache fits in cache_max_size MB """
+
+    cache = Path(cache_path)
+    cache.mkdir(parents=True, exist_ok=True)
+
+    path, info = get_fpocket_output(tmp_folder, container_path)
+
+    # write the entry aside and move it in place so concurrent runs never see it half written
+    tmp_entry = Path(tempfile.mkdtemp(prefix='.' + key, dir=cache))
+    fu.zip_list(zip_file=tmp_entry.joinpath(CACHE_POCKETS_ZIP), file_list=[str(i) for i in Path(path).joinpath('pockets').iterdir()])
+    with open(tmp_entry.joinpath(CACHE_SUMMARY), 'w') as outfile:
+        json.dump(parse_fpocket_info(info), outfile)
+    try:
+        tmp_entry.rename(cache.joinpath(key))
+        fu.log('Stored fpocket results in %s cache entry' % cache.joinpath(key), out_log)
+    except OSError:
+        # stored meanwhile by another run
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    evict_cache(cache_path, cache_max_size, out_log)
+
+
+def evict_cache(cache_path, cache_max_size, out_log):
+    """ Removes the least recently used entries of the fpocket cache until it fits in cache_max_size MB """
+
+    entries = []
+    for entry in Path(cache_path).iterdir():
+        if entry.name.startswith('.') or not entry.is_dir():
+            continue
+        try:
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((entry.stat().st_mtime, size, entry))
+        except OSError:
+            continue
+
+    total_size = sum(size for _, size, _ in entries)
+    max_size = float(cache_max_size) * 1024 * 1024
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total_size <= max_size:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total_size -= size
+        fu.log('Evicted %s cache entry' % entry, out_log)
+
+
+# POCKET TRACKING
+
+def run_fpocket(binary_path, input_path, min_radius=None, max_radius=None, num_spheres=None):
+    """ Runs fpocket quietly on input_path. Returns the fpocket output folder or None if fpocket failed """
+
+    cmd = [binary_path, '-f', str(input_path)]
+    if min_radius:
+        cmd.extend(['-m', str(min_radius)])
+    if max_radius:
+        cmd.extend(['-M', str(max_radius)])
+    if num_spheres:
+        cmd.extend(['-i', str(num_spheres)])
+
+    returncode = cmd_wrapper.CmdWrapper(cmd, disable_logs=True).launch()
+
+    path = Path(input_path).parent.joinpath(PurePath(input_path).stem + '_out')
+    if returncode or not path.is_dir():
+        return None
+
+    return path
+
+
+def read_fpocket_output(path):
+    """ Returns the summary dictionary and the list with the alpha sphere centres of every pocket of an fpocket output folder """
+
+    data = parse_fpocket_info(path.joinpath(path.name[:-len('_out')] + '_info.txt'))
+    centres = []
+    for pocket in data:
+        with open(path.joinpath('pockets', pocket + '_vert.pqr'), 'rb') as f:
+            centres.append(read_pocket_spheres(f.read())[:, :3])
+
+    return data, centres
+
+
+def extract_frames(input_ensemble_path, tmp_folder):
+    """ Writes every frame of a multi-model PDB file or of a zip file of PDB files to its own PDB file in tmp_folder.
+    Returns the list of (frame name, frame path) tuples in the ensemble order """
+
+    frames = []
+    if PurePath(input_ensemble_path).suffix.lower() == '.zip':
+        with zipfile.ZipFile(input_ensemble_path, 'r') as zip_f:
+            # the archive order is the ensemble order
+            for zip_info in (i for i in zip_f.infolist() if not i.is_dir() and i.filename.lower().endswith('.pdb')):
+                frame_path = str(PurePath(tmp_folder).joinpath('frame%d.pdb' % (len(frames) + 1)))
+                with zip_f.open(zip_info) as src, open(frame_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                frames.append((PurePath(zip_info.filename).stem, frame_path))
+        return frames
+
+    with open(input_ensemble_path) as f:
+        frame = None
+        for line in f:
+            record = line[:6].strip()
+            if record == 'MODEL':
+                frame = open(str(PurePath(tmp_folder).joinpath('frame%d.pdb' % (len(frames) + 1))), 'w')
+                frames.append(('model%s' % line[6:].strip(), frame.name))
+            elif record == 'ENDMDL':
+                if frame:
+                    frame.write('END\n')
+                    frame.close()
+                frame = None
+            elif frame and record in ('ATOM', 'HETATM', 'TER'):
+                frame.write(line)
+
+    # single model file
+    if not frames:
+        frame_path = str(PurePath(tmp_folder).joinpath('frame1.pdb'))
+        shutil.copy(input_ensemble_path, frame_path)
+        frames.append((PurePath(input_ensemble_path).stem, frame_path))
+
+    return frames
+
+
+def read_pocket_spheres(pqr_data):
+    """ Returns an (N, 4) array with the centre and radius of the alpha spheres in the contents (bytes) of an fpocket pocket PQR file """
+
+    return read_pqr_records(pqr_data)[:, [0, 1, 2, 4]]
+
+
+def pockets_overlap(centres_a, labels_a, num_a, centres_b, labels_b, num_b, distance):
+    """ Returns the (num_a, num_b) matrix with the fraction of the alpha sphere centres of each pocket of a lying within distance of any
+    alpha sphere centre of each pocket of b. labels_a and labels_b give the pocket index of each centre """
+
+    overlap = np.zeros((num_a, num_b))
+    if not len(centres_a) or not len(centres_b):
+        return overlap
+
+    # pairs of centres of b and a closer than distance
+    indices_b, indices_a = search_neighbor_pairs(centres_b, centres_a, distance)
+
+    # count each centre of a once per pocket of b
+    hits = np.unique(np.stack([indices_a, labels_b[indices_b]], axis=1), axis=0)
+    np.add.at(overlap, (labels_a[hits[:, 0]], hits[:, 1]), 1)
+
+    return overlap / np.maximum(np.bincount(labels_a, minlength=num_a), 1)[:, None]
+
+
+def track_pockets(frames, distance, min_overlap):
+    """ Matches the pockets of consecutive frames by the overlap of their alpha sphere centres.
+    frames is a list with the list of alpha sphere centres arrays of the pockets of each frame.
+    Returns an (n_tracks, n_frames) array with the index of the pocket of each track in each frame, -1 where the track is absent """
+
+    tracks = []
+    # alpha sphere centres of the last pocket assigned to each track
+    track_centres = []
+    for f, pockets in enumerate(frames):
+        centres = np.concatenate(pockets) if pockets else np.zeros((0, 3))
+        labels = np.repeat(np.arange(len(pockets)), [len(p) for p in pockets])
+        ref_centres = np.concatenate(track_centres) if track_centres else np.zeros((0, 3))
+        ref_labels = np.repeat(np.arange(len(track_centres)), [len(c) for c in track_centres])
+        overlap = pockets_overlap(centres, labels, len(pockets), ref_centres, ref_labels, len(track_centres), distance)
+
+        # greedy assignment from the largest overlap
+        assigned = np.full(len(pockets), -1)
+        used = np.zeros(len(track_centres), dtype=bool)
+        for p, t in zip(*np.unravel_index(np.argsort(-overlap, axis=None, kind='stable'), overlap.shape)):
+            if overlap[p, t] < min_overlap:
+                break
+            if assigned[p] < 0 and not used[t]:
+                assigned[p] = t
+                used[t] = True
+
+        for p, t in enumerate(assigned):
+            if t < 0:
+                tracks.append(np.full(len(frames), -1))
+                track_centres.append(pockets[p])
+                t = len(tracks) - 1
+            tracks[t][f] = p
+            track_centres[t] = pockets[p]
+
+    return np.array(tracks, dtype=np.int64).reshape(-1, len(frames))
+
+
+# POCKET GEOMETRY
+
+def read_pockets_spheres(zip_f):
+    """ Reads the alpha spheres of all the pockets of an fpocket pockets zip file in a single pass.
+    Returns the pocket names sorted by pocket number, an (N, 4) array with the centre and radius of every alpha sphere
+    and the (N,) array with the pocket index of each sphere """
+
+    pockets_index = get_pockets_index(zip_f)
+    names = sorted(pockets_index, key=lambda name: int(name[len('pocket'):]))
+
+    spheres = []
+    for name in names:
+        vert = [zip_info for zip_info in pockets_index[name] if zip_info.filename.endswith('_vert.pqr')]
+        # a pocket without its alpha spheres file keeps its index, with no spheres
+        spheres.append(read_pocket_spheres(zip_f.read(vert[0])) if vert else np.zeros((0, 4)))
+
+    labels = np.repeat(np.arange(len(names)), [len(s) for s in spheres])
+    spheres = np.concatenate(spheres) if spheres else np.zeros((0, 4))
+
+    return names, spheres, labels
+
+
+def pockets_geometry(spheres, labels, num_pockets):
+    """ Computes the geometry of all the pockets at once from their alpha spheres.
+    Returns a dictionary of arrays with one row per pocket: centroid, box_min, box_max, radius_of_gyration, principal_moments and principal_axes,
+    NaN for the pockets without alpha spheres """
+
+    centres = spheres[:, :3]
+    counts = np.bincount(labels, minlength=num_pockets)
+    sizes = np.maximum(counts, 1)[:, None]
+
+    centroid = np.stack([np.bincount(labels, weights=centres[:, i], minlength=num_pockets) for i in range(3)], axis=1) / sizes
+
+    # bounding box of the alpha spheres (spheres are sorted by pocket)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    box_min = np.full((num_pockets, 3), np.nan)
+    box_max = np.full((num_pockets, 3), np.nan)
+    found = counts > 0
+    box_min[found] = np.minimum.reduceat(centres - spheres[:, 3:], starts[found], axis=0)
+    box_max[found] = np.maximum.reduceat(centres + spheres[:, 3:], starts[found], axis=0)
+
+    # covariance matrices of the centres, diagonalized in a single batched call
+    delta = centres - centroid[labels]
+    covariance = np.zeros((num_pockets, 3, 3))
+    np.add.at(covariance, labels, delta[:, :, None] * delta[:, None, :])
+    covariance /= sizes[:, :, None]
+    moments, axes = np.linalg.eigh(covariance)
+    # largest moment first, one axis per row, with its largest component positive
+    moments, axes = moments[:, ::-1], np.swapaxes(axes[:, :, ::-1], 1, 2)
+    axes *= np.sign(np.take_along_axis(axes, np.abs(axes).argmax(axis=2)[:, :, None], axis=2))
+    centroid[~found] = np.nan
+    moments[~found] = np.nan
+    axes[~found] = np.nan
+
+    return {
+        'centroid': centroid,
+        'box_min': box_min,
+        'box_max': box_max,
+        'radius_of_gyration': np.sqrt(moments.sum(axis=1)),
+        'principal_moments': moments,
+        'principal_axes': axes
+    }
+
+
+def read_structure_atoms(pdb_path):
+    """ Returns the (N, 3) coordinates of the atoms of a PDB file, water excluded, and the list with the residue of each atom as chain:resname:resnum """
+
+    coords = []
+    residues = []
+    with open(pdb_path) as f:
+        for line in f:
+            if line.startswith('ENDMDL'):
+                break
+            if line.startswith(('ATOM', 'HETATM')) and line[17:20].strip() not in ('HOH', 'WAT'):
+                coords.append((line[30:38], line[38:46], line[46:54]))
+                residues.append('%s:%s:%s' % (line[21].strip(), line[17:20].strip(), line[22:27].strip()))
+
+    return np.array(coords, dtype=np.float64).reshape(-1, 3), residues
+
+
+def pockets_lining(spheres, labels, num_pockets, atoms, residues, distance):
+    """ Returns the list of the residues lining each pocket, those with an atom closer than the alpha sphere radius plus distance
+    to the centre of any alpha sphere of the pocket """
+
+    lining: list = [set() for _ in range(num_pockets)]
+    if not len(spheres) or not len(atoms):
+        return [[] for _ in range(num_pockets)]
+
+    tree = KDTree(np.ascontiguousarray(atoms, dtype=np.float64), 10)
+    for sphere, label in zip(spheres, labels):
+        for point in tree.search(np.ascontiguousarray(sphere[:3]), float(sphere[3]) + distance):
+            lining[label].add(residues[point.index])
+
+    order = {residue: i for i, residue in reversed(list(enumerate(residues)))}
+    return [sorted(residue_set, key=order.__getitem__) for residue_set in lining]
+
+
+def get_pockets_index(zip_f):
+    """ Indexes the members of an fpocket pockets zip file by pocket name """
+    pockets_index = {}
+    for zip_info in zip_f.infolist():
+        match = POCKET_MEMBER_RE.match(PurePath(zip_info.filename).name)
+        if match:
+            pockets_index.setdefault(match.group(1), []).append(zip_info)
+    return pockets_index
+
+
+def copy_zip_member(zip_in, zip_out, zip_info):
+    """ Copies a member from zip_in to zip_out keeping its name, date and compression type """
+    out_info = zipfile.ZipInfo(PurePath(zip_info.filename).name, date_time=zip_info.date_time)
+    out_info.compress_type = zip_info.compress_type
+    out_info.external_attr = zip_info.external_attr
+    out_info.file_size = zip_info.file_size
+    with zip_in.open(zip_info) as src, zip_out.open(out_info, 'w') as dst:
+        shutil.copyfileobj(src, dst)
+
+
+def process_output_fpocket_filter(search_list, input_pockets_zip, output_filter_pockets_zip, out_log):
+    """ Creates the output_filter_pockets_zip """
+
+    with zipfile.ZipFile(input_pockets_zip, 'r') as zip_in:
+        # index the input_pockets_zip members by pocket name
+        pockets_index = get_pockets_index(zip_in)
+
+        # select search_list items from pockets_index
+        sel_pockets_list = sorted((zip_info for s in search_list for zip_info in pockets_index.get(s, [])),
+                                  key=lambda zip_info: PurePath(zip_info.filename).name)
+
+        fu.log('Creating %s output file' % output_filter_pockets_zip, out_log)
+
+        # copy the selected members to output_filter_pockets_zip
+        with zipfile.ZipFile(output_filter_pockets_zip, 'w') as zip_out:
+            for zip_info in sel_pockets_list:
+                copy_zip_member(zip_in, zip_out, zip_info)
+
+    fu.log('Adding: %s' % [PurePath(zip_info.filename).name for zip_info in sel_pockets_list], out_log)
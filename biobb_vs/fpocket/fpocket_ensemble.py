@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""Module containing the FPocketEnsemble class and the command line interface."""
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import shutil
+import numpy as np
+from biobb_common.generic.biobb_object import BiobbObject
+from biobb_common.tools import file_utils as fu
+from biobb_common.tools.file_utils import launchlogger
+from biobb_vs.fpocket.common import FPOCKET_DESCRIPTORS, check_input_path, check_output_path, extract_frames, read_fpocket_output, run_fpocket, track_pockets
+
+
+class FPocketEnsemble(BiobbObject):
+    """
+    | biobb_vs FPocketEnsemble
+    | Wrapper of the fpocket software for structural ensembles.
+    | Finds the binding sites of every frame of the input_ensemble_path ensemble via the `fpocket <https://github.com/Discngine/fpocket>`_ software and tracks them along the frames.
+
+    Args:
+        input_ensemble_path (str): Path to the ensemble where the binding sites are to be found, either a multi-model PDB file or a zip file with one PDB file per frame. File type: input. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/data/fpocket/input_ensemble.zip>`_. Accepted formats: pdb (edam:format_1476), zip (edam:format_3987).
+        output_ensemble_npz (str): Path to the compressed NumPy file with the pockets tracked along the ensemble. It contains the frames names, the pockets names, the occupancy of each pocket, the fpocket pocket number of each pocket in each frame (0 when absent) and one time series array per fpocket descriptor (NaN when absent). File type: output. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/reference/fpocket/ref_output_ensemble.npz>`_. Accepted formats: npz (edam:format_4003).
+        properties (dic - Python dictionary object containing the tool parameters, not input/output files):
+            * **min_radius** (*float*) - (None) [0.1~1000|0.1] The minimum radius in Ångstroms an alpha sphere might have in a binding pocket.
+            * **max_radius** (*float*) - (None) [2~1000|0.1] The maximum radius in Ångstroms of alpha spheres in a pocket.
+            * **num_spheres** (*int*) - (None) [1~1000|1] Indicates how many alpha spheres a pocket must contain at least in order to figure in the results.
+            * **overlap_distance** (*float*) - (2.0) [0.1~10|0.1] Distance in Ångstroms under which two alpha sphere centres of pockets of different frames are considered overlapping.
+            * **min_overlap** (*float*) - (0.5) [0~1|0.05] Minimum fraction of overlapping alpha sphere centres for a pocket to be matched with a pocket of the previous frames.
+            * **num_workers** (*int*) - (1) [1~1000|1] Number of fpocket processes run in parallel.
+            * **binary_path** (*string*) - ('fpocket') path to fpocket in your local computer.
+            * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
+            * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
+            * **sandbox_path** (*str*) - ("./") [WF property] Parent path to the sandbox directory.
+
+    Examples:
+        This is a use example of how to use the building block from Python::
+
+            from biobb_vs.fpocket.fpocket_ensemble import fpocket_ensemble
+            prop = {
+                'min_radius': 3,
+                'max_radius': 6,
+                'num_spheres': 35,
+                'num_workers': 8
+            }
+            fpocket_ensemble(input_ensemble_path='/path/to/myTrajectory.pdb',
+                    output_ensemble_npz='/path/to/newEnsemble.npz',
+                    properties=prop)
+
+    Info:
+        * wrapped_software:
+            * name: fpocket
+            * version: ==4.1
+            * license: MIT
+        * ontology:
+            * name: EDAM
+            * schema: http://edamontology.org/EDAM.owl
+
+    """
+
+    def __init__(self, input_ensemble_path, output_ensemble_npz,
+                 properties=None, **kwargs) -> None:
+        properties = properties or {}
+
+        # Call parent class constructor
+        super().__init__(properties)
+        self.locals_var_dict = locals().copy()
+
+        # Input/Output files
+        self.io_dict = {
+            "in": {"input_ensemble_path": input_ensemble_path},
+            "out": {"output_ensemble_npz": output_ensemble_npz}
+        }
+
+        # Properties specific for BB
+        self.binary_path = properties.get('binary_path', 'fpocket')
+        self.min_radius = properties.get('min_radius', None)
+        self.max_radius = properties.get('max_radius', None)
+        self.num_spheres = properties.get('num_spheres', None)
+        self.overlap_distance = float(properties.get('overlap_distance', 2.0))
+        self.min_overlap = float(properties.get('min_overlap', 0.5))
+        self.num_workers = int(properties.get('num_workers', 1))
+        self.properties = properties
+
+        # Check the properties
+        self.check_properties(properties)
+        self.check_arguments()
+
+    def check_data_params(self, out_log, err_log):
+        """ Checks all the input/output paths and parameters """
+        self.io_dict["in"]["input_ensemble_path"] = check_input_path(self.io_dict["in"]["input_ensemble_path"], "input_ensemble_path", out_log, self.__class__.__name__)
+        self.io_dict["out"]["output_ensemble_npz"] = check_output_path(self.io_dict["out"]["output_ensemble_npz"], "output_ensemble_npz", False, out_log, self.__class__.__name__)
+
+    def run_frame(self, frame_path):
+        """ Runs fpocket on a single frame and returns its summary dictionary and the alpha sphere centres of its pockets """
+
+        path = run_fpocket(self.binary_path, frame_path, self.min_radius, self.max_radius, self.num_spheres)
+        if not path:
+            fu.log(self.__class__.__name__ + ': Error executing fpocket on %s, please check your properties' % frame_path, self.out_log)
+            raise SystemExit(self.__class__.__name__ + ': Error executing fpocket on %s, please check your properties' % frame_path)
+
+        data, centres = read_fpocket_output(path)
+
+        # keep the disk usage bounded along long trajectories
+        if self.remove_tmp:
+            shutil.rmtree(path, ignore_errors=True)
+            Path(frame_path).unlink()
+
+        return data, centres
+
+    @launchlogger
+    def launch(self) -> int:
+        """Execute the :class:`FPocketEnsemble <fpocket.fpocket_ensemble.FPocketEnsemble>` fpocket.fpocket_ensemble.FPocketEnsemble object."""
+
+        # check input/output paths and parameters
+        self.check_data_params(self.out_log, self.err_log)
+
+        # Setup Biobb
+        if self.check_restart():
+            return 0
+        self.stage_files()
+
+        # create tmp_folder
+        tmp_folder = fu.create_unique_dir()
+        fu.log('Creating %s temporary folder' % tmp_folder, self.out_log)
+        self.tmp_files.append(tmp_folder)
+
+        # split the ensemble into one PDB file per frame
+        frames = extract_frames(self.io_dict["in"]["input_ensemble_path"], tmp_folder)
+        if not frames:
+            fu.log(self.__class__.__name__ + ': No frames found in %s, exiting' % self.io_dict["in"]["input_ensemble_path"], self.out_log)
+            raise SystemExit(self.__class__.__name__ + ': No frames found in %s, exiting' % self.io_dict["in"]["input_ensemble_path"])
+
+        fu.log('Executing fpocket on %d frames with %d workers' % (len(frames), self.num_workers), self.out_log, self.global_log)
+
+        # fpocket runs as an external process, so threads are enough to keep the workers busy
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            results = list(executor.map(self.run_frame, [frame_path for _, frame_path in frames]))
+
+        fu.log('%d pockets found along the ensemble' % sum(len(data) for data, _ in results), self.out_log)
+
+        # match the pockets across frames
+        tracks = track_pockets([centres for _, centres in results], self.overlap_distance, self.min_overlap)
+        present = tracks >= 0
+        occupancy = present.mean(axis=1)
+        # most populated pockets first, then by first appearance
+        order = np.lexsort((present.argmax(axis=1), -occupancy))
+        tracks, present, occupancy = tracks[order], present[order], occupancy[order]
+
+        fu.log('%d pockets tracked along %d frames' % (len(tracks), len(frames)), self.out_log)
+
+        arrays = {
+            'frames': np.array([name for name, _ in frames]),
+            'pockets': np.array(['pocket%d' % (i + 1) for i in range(len(tracks))]),
+            'occupancy': occupancy,
+            'frame_pocket': np.zeros(tracks.shape, dtype=np.int32)
+        }
+        for name, _ in FPOCKET_DESCRIPTORS:
+            arrays[name] = np.full(tracks.shape, np.nan, dtype=np.float32)
+
+        frames_pockets = [list(data.items()) for data, _ in results]
+        for t, f in zip(*np.nonzero(present)):
+            pocket, descriptors = frames_pockets[f][tracks[t, f]]
+            arrays['frame_pocket'][t, f] = int(pocket[len('pocket'):])
+            for name, _ in FPOCKET_DESCRIPTORS:
+                arrays[name][t, f] = descriptors.get(name, np.nan)
+
+        fu.log('Saving pockets time series to %s file' % self.io_dict["out"]["output_ensemble_npz"], self.out_log)
+        np.savez_compressed(self.io_dict["out"]["output_ensemble_npz"], **arrays)
+
+        # Copy files to host
+        self.copy_to_host()
+
+        self.remove_tmp_files()
+
+        self.check_arguments(output_files_created=True, raise_exception=False)
+
+        return 0
+
+
+def fpocket_ensemble(input_ensemble_path: str, output_ensemble_npz: str, properties: Optional[dict] = None, **kwargs) -> int:
+    """Create the :class:`FPocketEnsemble <fpocket.fpocket_ensemble.FPocketEnsemble>` class and
+    execute the :meth:`launch() <fpocket.fpocket_ensemble.FPocketEnsemble.launch>` method."""
+    return FPocketEnsemble(**dict(locals())).launch()
+
+
+fpocket_ensemble.__doc__ = FPocketEnsemble.__doc__
+main = FPocketEnsemble.get_main(fpocket_ensemble, "Finds the binding sites of every frame of the input_ensemble_path ensemble via the fpocket software and tracks them along the frames.")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@
 """Module containing the FPocketFilter class and the command line interface."""
 import json
 from typing import Optional
+import numpy as np
 from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
@@ -10,8 +11,11 @@ from biobb_common.tools.file_utils import launchlogger
 from biobb_vs.fpocket.common import (
     check_input_path,
     check_output_path,
+    check_query,
     check_range,
     process_output_fpocket_filter,
+    query_summary,
+    summary_to_array,
 )
 from biobb_vs.utils.common import _from_string_to_list
 
@@ -30,6 +34,7 @@ class FPocketFilter(BiobbObject):
             * **score** (*list*) - (None) List of two float numbers between 0 and 1 indicating the score range. Indicates the fpocket score after the evaluation of pocket prediction accuracy as defined in the `fpocket paper <https://doi.org/10.1186/1471-2105-10-168>`_.
             * **druggability_score** (*list*) - (None) List of two float numbers between 0 and 1 indicating the druggability_score range. It's a value between 0 and 1, 0 signifying that the pocket is likely to not bind a drug like molecule and 1, that it is very likely to bind the latter.
             * **volume** (*list*) - (None) List of two float numbers indicating the volume range. Indicates the pocket volume.
+            * **query** (*list*) - (None) Boolean expression or list of boolean expressions over the fpocket descriptors. Only the pockets fulfilling all of them will be selected (ie: "hydrophobicity_score > 30 and polarity_score <= 8"). Accepted descriptors: score, druggability_score, number_of_alpha_spheres, total_sasa, polar_sasa, apolar_sasa, volume, mean_local_hydrophobic_density, mean_alpha_sphere_radius, mean_alp_sph_solvent_access, apolar_alpha_sphere_proportion, hydrophobicity_score, volume_score, polarity_score, charge_score, proportion_of_polar_atoms, alpha_sphere_density, cent_of_mass_alpha_sphere_max_dist, flexibility.
             * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
             * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
             * **sandbox_path** (*str*) - ("./") [WF property] Parent path to the sandbox directory.
@@ -41,7 +46,8 @@ class FPocketFilter(BiobbObject):
             prop = {
                 'score': [0.2, 1],
                 'druggability_score': [0.2, 0.8],
-                'volume': [100, 600.2]
+                'volume': [100, 600.2],
+                'query': 'hydrophobicity_score > 30 and polarity_score <= 8'
             }
             fpocket_filter(input_pockets_zip='/path/to/myPockets.zip',
                     input_summary='/path/to/mySummary.json',
@@ -93,6 +99,7 @@ class FPocketFilter(BiobbObject):
         self.volume = [
             float(elem) for elem in _from_string_to_list(properties.get("volume", None))
         ]
+        self.query = properties.get("query", None)
         self.properties = properties
 
         # Check the properties
@@ -122,17 +129,6 @@ class FPocketFilter(BiobbObject):
             self.__class__.__name__,
         )
 
-    def score_matcher(self, score):
-        return lambda d: d["score"] > score[0] and d["score"] <= score[1]
-
-    def druggability_score_matcher(self, druggability_score):
-        return (
-            lambda d: d["druggability_score"] > druggability_score[0] and d["druggability_score"] <= druggability_score[1]
-        )
-
-    def volume_matcher(self, volume):
-        return lambda d: d["volume"] > volume[0] and d["volume"] <= volume[1]
-
     @launchlogger
     def launch(self) -> int:
         """Execute the :class:`FPocketFilter <fpocket.fpocket_filter.FPocketFilter>` fpocket.fpocket_filter.FPocketFilter object."""
@@ -149,14 +145,17 @@ class FPocketFilter(BiobbObject):
         with open(self.io_dict["in"]["input_summary"]) as json_file:
             data = json.load(json_file)
 
-        # build search_list
-        search_list = []
-        ranges = {}
+        # load input_summary into a structured array
+        table = summary_to_array(data)
+
+        # build search mask
+        mask = np.ones(len(table), dtype=bool)
+        ranges: dict = {}
         if self.score:
             check_range(
                 "score", self.score, [0, 1], self.out_log, self.__class__.__name__
             )
-            search_list.append(self.score_matcher(self.score))
+            mask &= (table["score"] > self.score[0]) & (table["score"] <= self.score[1])
             ranges["score"] = self.score
         if self.druggability_score:
             check_range(
@@ -166,14 +165,20 @@ class FPocketFilter(BiobbObject):
                 self.out_log,
                 self.__class__.__name__,
             )
-            search_list.append(self.druggability_score_matcher(self.druggability_score))
+            mask &= (table["druggability_score"] > self.druggability_score[0]) & (
+                table["druggability_score"] <= self.druggability_score[1]
+            )
             ranges["druggability_score"] = self.druggability_score
         if self.volume:
             check_range(
                 "volume", self.volume, [0, 10000], self.out_log, self.__class__.__name__
             )
-            search_list.append(self.volume_matcher(self.volume))
+            mask &= (table["volume"] > self.volume[0]) & (table["volume"] <= self.volume[1])
             ranges["volume"] = self.volume
+        if self.query:
+            queries = check_query(self.query, self.out_log, self.__class__.__name__)
+            mask &= query_summary(table, queries)
+            ranges["query"] = " and ".join("(%s)" % q for q in queries)
 
         fu.log(
             "Performing a search under the next parameters: %s"
@@ -182,7 +187,7 @@ class FPocketFilter(BiobbObject):
         )
 
         # perform search
-        search = [x for x in data if all([f(data[x]) for f in search_list])]
+        search = table["pocket"][mask].tolist()
 
         if len(search) == 0:
             fu.log("No matches found", self.out_log)
@@ -202,23 +207,16 @@ class FPocketFilter(BiobbObject):
 
         fu.log("Found %d matches:%s" % (len(search), str_out), self.out_log)
 
-        # create tmp_folder
-        tmp_folder = fu.create_unique_dir()
-        fu.log("Creating %s temporary folder" % tmp_folder, self.out_log)
-
         process_output_fpocket_filter(
             search,
-            tmp_folder,
             self.io_dict["in"]["input_pockets_zip"],
             self.io_dict["out"]["output_filter_pockets_zip"],
-            self.remove_tmp,
             self.out_log,
         )
 
         # Copy files to host
         self.copy_to_host()
 
-        self.tmp_files.append(tmp_folder)
         self.remove_tmp_files()
 
         self.check_arguments(output_files_created=True, raise_exception=False)
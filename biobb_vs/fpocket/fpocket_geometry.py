@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+"""Module containing the FPocketGeometry class and the command line interface."""
+from typing import Optional
+import json
+import zipfile
+import numpy as np
+from biobb_common.generic.biobb_object import BiobbObject
+from biobb_common.tools import file_utils as fu
+from biobb_common.tools.file_utils import launchlogger
+from biobb_vs.fpocket.common import check_input_path, check_output_path, pockets_geometry, pockets_lining, read_pockets_spheres, read_structure_atoms
+
+
+class FPocketGeometry(BiobbObject):
+    """
+    | biobb_vs FPocketGeometry
+    | Computes the geometry of the pockets found by the fpocket building block.
+    | Computes the centroid, bounding box, principal axes and lining residues of every pocket in the outputs of the fpocket building block from their alpha spheres.
+
+    Args:
+        input_pockets_zip (str): Path to all the pockets found by fpocket. File type: input. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/data/fpocket/input_pockets.zip>`_. Accepted formats: zip (edam:format_3987).
+        output_geometry (str): Path to the JSON file with the geometry of every pocket. File type: output. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/reference/fpocket/ref_output_geometry.json>`_. Accepted formats: json (edam:format_3464).
+        input_pdb_path (str) (Optional): Path to the PDB structure where the pockets were found, used to compute the residues lining each pocket. File type: input. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/data/fpocket/fpocket_input.pdb>`_. Accepted formats: pdb (edam:format_1476).
+        properties (dic - Python dictionary object containing the tool parameters, not input/output files):
+            * **lining_distance** (*float*) - (0.5) [0~5|0.1] Distance in Ångstroms added to the radius of each alpha sphere to look for the atoms of the lining residues.
+            * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
+            * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
+            * **sandbox_path** (*str*) - ("./") [WF property] Parent path to the sandbox directory.
+
+    Examples:
+        This is a use example of how to use the building block from Python::
+
+            from biobb_vs.fpocket.fpocket_geometry import fpocket_geometry
+            prop = {
+                'lining_distance': 0.5
+            }
+            fpocket_geometry(input_pockets_zip='/path/to/myPockets.zip',
+                    output_geometry='/path/to/newGeometry.json',
+                    input_pdb_path='/path/to/myStructure.pdb',
+                    properties=prop)
+
+    Info:
+        * wrapped_software:
+            * name: In house
+            * license: Apache-2.0
+        * ontology:
+            * name: EDAM
+            * schema: http://edamontology.org/EDAM.owl
+
+    """
+
+    def __init__(self, input_pockets_zip, output_geometry, input_pdb_path=None,
+                 properties=None, **kwargs) -> None:
+        properties = properties or {}
+
+        # Call parent class constructor
+        super().__init__(properties)
+        self.locals_var_dict = locals().copy()
+
+        # Input/Output files
+        self.io_dict = {
+            "in": {"input_pockets_zip": input_pockets_zip, "input_pdb_path": input_pdb_path},
+            "out": {"output_geometry": output_geometry}
+        }
+
+        # Properties specific for BB
+        self.lining_distance = float(properties.get('lining_distance', 0.5))
+        self.properties = properties
+
+        # Check the properties
+        self.check_properties(properties)
+        self.check_arguments()
+
+    def check_data_params(self, out_log, err_log):
+        """ Checks all the input/output paths and parameters """
+        self.io_dict["in"]["input_pockets_zip"] = check_input_path(self.io_dict["in"]["input_pockets_zip"], "input_pockets_zip", out_log, self.__class__.__name__)
+        if self.io_dict["in"]["input_pdb_path"]:
+            self.io_dict["in"]["input_pdb_path"] = check_input_path(self.io_dict["in"]["input_pdb_path"], "input_pdb_path", out_log, self.__class__.__name__)
+        self.io_dict["out"]["output_geometry"] = check_output_path(self.io_dict["out"]["output_geometry"], "output_geometry", False, out_log, self.__class__.__name__)
+
+    @launchlogger
+    def launch(self) -> int:
+        """Execute the :class:`FPocketGeometry <fpocket.fpocket_geometry.FPocketGeometry>` fpocket.fpocket_geometry.FPocketGeometry object."""
+
+        # check input/output paths and parameters
+        self.check_data_params(self.out_log, self.err_log)
+
+        # Setup Biobb
+        if self.check_restart():
+            return 0
+        self.stage_files()
+
+        # read the alpha spheres of all the pockets
+        with zipfile.ZipFile(self.io_dict["in"]["input_pockets_zip"], 'r') as zip_f:
+            names, spheres, labels = read_pockets_spheres(zip_f)
+
+        if not names:
+            fu.log(self.__class__.__name__ + ': No pockets found in %s, exiting' % self.io_dict["in"]["input_pockets_zip"], self.out_log)
+            raise SystemExit(self.__class__.__name__ + ': No pockets found in %s, exiting' % self.io_dict["in"]["input_pockets_zip"])
+
+        fu.log('Computing the geometry of %d pockets from %d alpha spheres' % (len(names), len(spheres)), self.out_log)
+        geometry = pockets_geometry(spheres, labels, len(names))
+        geometry['num_spheres'] = np.bincount(labels, minlength=len(names))
+
+        lining = None
+        if self.io_dict["in"]["input_pdb_path"]:
+            atoms, residues = read_structure_atoms(self.io_dict["in"]["input_pdb_path"])
+            fu.log('Looking for the lining residues of the pockets among %d atoms of %s' % (len(atoms), self.io_dict["in"]["input_pdb_path"]), self.out_log)
+            lining = pockets_lining(spheres, labels, len(names), atoms, residues, self.lining_distance)
+
+        results = {}
+        for i, name in enumerate(names):
+            # no geometry (null) for the pockets without alpha spheres
+            results[name] = {key: np.round(values[i], 3).tolist() if geometry['num_spheres'][i] or key == 'num_spheres' else None for key, values in geometry.items()}
+            if lining is not None:
+                results[name]['lining_residues'] = lining[i]
+
+        fu.log('Saving geometry to %s file' % self.io_dict["out"]["output_geometry"], self.out_log)
+        with open(self.io_dict["out"]["output_geometry"], 'w') as outfile:
+            json.dump(results, outfile, indent=4)
+
+        # Copy files to host
+        self.copy_to_host()
+
+        self.remove_tmp_files()
+
+        self.check_arguments(output_files_created=True, raise_exception=False)
+
+        return 0
+
+
+def fpocket_geometry(input_pockets_zip: str, output_geometry: str, input_pdb_path: Optional[str] = None, properties: Optional[dict] = None, **kwargs) -> int:
+    """Create the :class:`FPocketGeometry <fpocket.fpocket_geometry.FPocketGeometry>` class and
+    execute the :meth:`launch() <fpocket.fpocket_geometry.FPocketGeometry.launch>` method."""
+    return FPocketGeometry(**dict(locals())).launch()
+
+
+fpocket_geometry.__doc__ = FPocketGeometry.__doc__
+main = FPocketGeometry.get_main(fpocket_geometry, "Computes the centroid, bounding box, principal axes and lining residues of every pocket in the outputs of the fpocket building block from their alpha spheres.")
+
+
+if __name__ == '__main__':
+    main()
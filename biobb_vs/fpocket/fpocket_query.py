@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""Module containing the FPocketQuery class and the command line interface."""
+from typing import Optional
+import json
+from biobb_common.generic.biobb_object import BiobbObject
+from biobb_common.tools import file_utils as fu
+from biobb_common.tools.file_utils import launchlogger
+from biobb_vs.fpocket.common import FPOCKET_DESCRIPTORS, check_input_path, check_output_path, check_query, check_sort_by, query_pockets_db
+from biobb_vs.utils.common import _from_string_to_list
+
+
+class FPocketQuery(BiobbObject):
+    """
+    | biobb_vs FPocketQuery
+    | Performs a search over a database of pockets found by the fpocket building block.
+    | Finds the pockets of one or more structures in a SQLite pockets database filled by the fpocket building block from given parameters.
+
+    Args:
+        input_pockets_db (str): Path to the SQLite pockets database filled by the fpocket_run building block through its db_path property. File type: input. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/data/fpocket/input_pockets.db>`_. Accepted formats: db (edam:format_3621), sqlite (edam:format_3621).
+        output_query_summary (str): Path to the JSON file with the list of pockets found, sorted by the sort_by property. File type: output. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/reference/fpocket/ref_output_query_summary.json>`_. Accepted formats: json (edam:format_3464).
+        properties (dic - Python dictionary object containing the tool parameters, not input/output files):
+            * **structures** (*list*) - (None) List of structure names to search in. If not provided, the pockets of all the structures in the database will be searched.
+            * **query** (*list*) - (None) Boolean expression or list of boolean expressions over the fpocket descriptors. Only the pockets fulfilling all of them will be selected (ie: "volume > 300 and druggability_score > 0.5"). Accepted descriptors: score, druggability_score, number_of_alpha_spheres, total_sasa, polar_sasa, apolar_sasa, volume, mean_local_hydrophobic_density, mean_alpha_sphere_radius, mean_alp_sph_solvent_access, apolar_alpha_sphere_proportion, hydrophobicity_score, volume_score, polarity_score, charge_score, proportion_of_polar_atoms, alpha_sphere_density, cent_of_mass_alpha_sphere_max_dist, flexibility.
+            * **sort_by** (*str*) - ('druggability_score') From which property the output will be sorted. Any descriptor of the fpocket summary can be used, such as druggability_score (this score intends to assess the likeliness of the pocket to bind a small drug like molecule), score (fpocket score as defined in the `fpocket paper <https://doi.org/10.1186/1471-2105-10-168>`_) or volume (volume of the pocket).
+            * **top_k** (*int*) - (0) [0~100000|1] Number of best pockets to be returned. If 0, all the pockets found will be returned.
+            * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
+            * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
+            * **sandbox_path** (*str*) - ("./") [WF property] Parent path to the sandbox directory.
+
+    Examples:
+        This is a use example of how to use the building block from Python::
+
+            from biobb_vs.fpocket.fpocket_query import fpocket_query
+            prop = {
+                'structures': ['myStructure'],
+                'query': 'volume > 300 and druggability_score > 0.5',
+                'sort_by': 'druggability_score',
+                'top_k': 10
+            }
+            fpocket_query(input_pockets_db='/path/to/myPockets.db',
+                    output_query_summary='/path/to/newSummary.json',
+                    properties=prop)
+
+    Info:
+        * wrapped_software:
+            * name: In house
+            * license: Apache-2.0
+        * ontology:
+            * name: EDAM
+            * schema: http://edamontology.org/EDAM.owl
+
+    """
+
+    def __init__(self, input_pockets_db, output_query_summary,
+                 properties=None, **kwargs) -> None:
+        properties = properties or {}
+
+        # Call parent class constructor
+        super().__init__(properties)
+        self.locals_var_dict = locals().copy()
+
+        # Input/Output files
+        self.io_dict = {
+            "in": {"input_pockets_db": input_pockets_db},
+            "out": {"output_query_summary": output_query_summary}
+        }
+
+        # Properties specific for BB
+        self.structures = _from_string_to_list(properties.get('structures', None))
+        self.query = properties.get('query', None)
+        self.sort_by = properties.get('sort_by', 'druggability_score')
+        self.top_k = int(properties.get('top_k', 0))
+        self.properties = properties
+
+        # Check the properties
+        self.check_properties(properties)
+        self.check_arguments()
+
+    def check_data_params(self, out_log, err_log):
+        """ Checks all the input/output paths and parameters """
+        self.io_dict["in"]["input_pockets_db"] = check_input_path(self.io_dict["in"]["input_pockets_db"], "input_pockets_db", out_log, self.__class__.__name__)
+        self.io_dict["out"]["output_query_summary"] = check_output_path(self.io_dict["out"]["output_query_summary"], "output_query_summary", False, out_log, self.__class__.__name__)
+
+    @launchlogger
+    def launch(self) -> int:
+        """Execute the :class:`FPocketQuery <fpocket.fpocket_query.FPocketQuery>` fpocket.fpocket_query.FPocketQuery object."""
+
+        # check input/output paths and parameters
+        self.check_data_params(self.out_log, self.err_log)
+
+        # Setup Biobb
+        if self.check_restart():
+            return 0
+        self.stage_files()
+
+        check_sort_by(self.sort_by, self.out_log, self.__class__.__name__)
+        queries = check_query(self.query, self.out_log, self.__class__.__name__) if self.query else []
+
+        fu.log('Searching %s in %s database' % (', '.join(self.structures) if self.structures else 'all the structures', self.io_dict["in"]["input_pockets_db"]), self.out_log)
+        if queries:
+            fu.log('Query: %s' % ' and '.join('(%s)' % q for q in queries), self.out_log)
+
+        try:
+            table = query_pockets_db(self.io_dict["in"]["input_pockets_db"], self.structures, queries, self.sort_by, self.top_k)
+        except ValueError as e:
+            fu.log(self.__class__.__name__ + ': Wrong query: %s, exiting' % e, self.out_log)
+            raise SystemExit(self.__class__.__name__ + ': Wrong query: %s, exiting' % e)
+
+        fu.log('Found %d matches sorted by %s' % (len(table), self.sort_by), self.out_log)
+
+        # save summary
+        names = [name for name, _ in FPOCKET_DESCRIPTORS]
+        results = [dict(zip(['structure', 'pocket'] + names, row)) for row in table.tolist()]
+        fu.log('Saving summary to %s file' % self.io_dict["out"]["output_query_summary"], self.out_log)
+        with open(self.io_dict["out"]["output_query_summary"], 'w') as outfile:
+            json.dump(results, outfile, indent=4)
+
+        # Copy files to host
+        self.copy_to_host()
+
+        self.remove_tmp_files()
+
+        self.check_arguments(output_files_created=True, raise_exception=False)
+
+        return 0
+
+
+def fpocket_query(input_pockets_db: str, output_query_summary: str, properties: Optional[dict] = None, **kwargs) -> int:
+    """Create the :class:`FPocketQuery <fpocket.fpocket_query.FPocketQuery>` class and
+    execute the :meth:`launch() <fpocket.fpocket_query.FPocketQuery.launch>` method."""
+    return FPocketQuery(**dict(locals())).launch()
+
+
+fpocket_query.__doc__ = FPocketQuery.__doc__
+main = FPocketQuery.get_main(fpocket_query, "Finds the pockets of one or more structures in a SQLite pockets database filled by the fpocket building block from given parameters.")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,7 @@ from pathlib import PurePath
 from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
-from biobb_vs.fpocket.common import check_input_path, check_output_path, process_output_fpocket
+from biobb_vs.fpocket.common import check_input_path, check_output_path, check_sort_keys, get_cache_key, get_fpocket_version, process_output_fpocket, restore_cached_fpocket, store_cached_fpocket, store_pockets
 
 
 class FPocketRun(BiobbObject):
@@ -24,7 +24,13 @@ class FPocketRun(BiobbObject):
             * **min_radius** (*float*) - (None) [0.1~1000|0.1] The minimum radius in Ångstroms an alpha sphere might have in a binding pocket.
             * **max_radius** (*float*) - (None) [2~1000|0.1] The maximum radius in Ångstroms of alpha spheres in a pocket.
             * **num_spheres** (*int*) - (None) [1~1000|1] Indicates how many alpha spheres a pocket must contain at least in order to figure in the results.
-            * **sort_by** (*str*) - ('druggability_score') From which property the output will be sorted. Values: druggability_score (this score intends to assess the likeliness of the pocket to bind a small drug like molecule), score (fpocket score as defined in the `fpocket paper <https://doi.org/10.1186/1471-2105-10-168>`_), volume (volume of the pocket).
+            * **sort_by** (*str*) - ('druggability_score') From which property the output will be sorted. A list of descriptors or expressions over the fpocket descriptors can also be given, each one breaking the ties of the previous ones (ie: ["druggability_score", "volume / number_of_alpha_spheres"]). Any descriptor of the fpocket summary can be used, such as druggability_score (this score intends to assess the likeliness of the pocket to bind a small drug like molecule), score (fpocket score as defined in the `fpocket paper <https://doi.org/10.1186/1471-2105-10-168>`_) or volume (volume of the pocket).
+            * **top_k** (*int*) - (0) [0~1000|1] Number of best pockets by sort_by kept in the output_pockets_zip and output_summary files. If 0, all the pockets are kept.
+            * **db_path** (*str*) - (None) Path to a SQLite pockets database where the pockets found will be appended. It can be shared by many runs and queried with the fpocket_query building block.
+            * **structure_name** (*str*) - (None) Name of the structure in the pockets database. If not provided, the name of the input_pdb_path file without extension will be used.
+            * **cache_path** (*str*) - (None) Path to a folder where the fpocket results are cached by structure content, parameters and fpocket version. Runs on an identical structure with the same parameters restore their outputs from it instead of executing fpocket.
+            * **cache_max_size** (*float*) - (1024) [1~1000000|1] Maximum size in MB of the cache_path folder. The least recently used results are removed when it is exceeded.
+            * **scratch_path** (*str*) - (None) Path to a fast local folder (ie: node-local disk or /dev/shm) where fpocket writes its raw output. Only the output_pockets_zip and output_summary files are written to their output paths. If not provided, the working directory is used. Ignored when container_path is given.
             * **binary_path** (*string*) - ('fpocket') path to fpocket in your local computer.
             * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
             * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
@@ -44,7 +50,8 @@ class FPocketRun(BiobbObject):
                 'min_radius': 3,
                 'max_radius': 6,
                 'num_spheres': 35,
-                'sort_by': 'druggability_score'
+                'sort_by': 'druggability_score',
+                'top_k': 10
             }
             fpocket_run(input_pdb_path='/path/to/myStructure.pdb',
                     output_pockets_zip='/path/to/newPockets.zip',
@@ -82,6 +89,12 @@ class FPocketRun(BiobbObject):
         self.max_radius = properties.get('max_radius', None)
         self.num_spheres = properties.get('num_spheres', None)
         self.sort_by = properties.get('sort_by', 'druggability_score')
+        self.top_k = int(properties.get('top_k', 0))
+        self.db_path = properties.get('db_path', None)
+        self.structure_name = properties.get('structure_name', None)
+        self.cache_path = properties.get('cache_path', None)
+        self.cache_max_size = properties.get('cache_max_size', 1024)
+        self.scratch_path = properties.get('scratch_path', None)
         self.properties = properties
 
         # Check the properties
@@ -106,49 +119,87 @@ class FPocketRun(BiobbObject):
             return 0
         self.stage_files()
 
-        if self.container_path:
-            tmp_input = str(PurePath(self.container_volume_path).joinpath(PurePath(self.io_dict["in"]["input_pdb_path"]).name))
-            tmp_folder = self.stage_io_dict['unique_dir']
-        else:
-            # create tmp_folder
-            tmp_folder = fu.create_unique_dir()
-            fu.log('Creating %s temporary folder' % tmp_folder, self.out_log)
-            tmp_input = str(PurePath(tmp_folder).joinpath('input.pdb'))
-            # copy input_pdb_path to tmp_folder
-            shutil.copy(self.io_dict["in"]["input_pdb_path"], tmp_input)
-
-        # create cmd
-        self.cmd = [self.binary_path,
-                    '-f', tmp_input]
-
-        # adding extra properties
-        if self.min_radius:
-            self.cmd.extend(['-m', str(self.min_radius)])
-
-        if self.max_radius:
-            self.cmd.extend(['-M', str(self.max_radius)])
-
-        if self.num_spheres:
-            self.cmd.extend(['-i', str(self.num_spheres)])
-
-        fu.log('Executing fpocket', self.out_log, self.global_log)
-
-        # Run Biobb block
-        self.run_biobb()
-
-        # Copy files to host
-        self.copy_to_host()
-
-        process_output_fpocket(tmp_folder,
-                               self.io_dict["out"]["output_pockets_zip"],
-                               self.io_dict["out"]["output_summary"],
-                               self.sort_by,
-                               self.remove_tmp,
-                               self.container_path,
-                               self.out_log,
-                               self.__class__.__name__)
-
-        self.tmp_files.append(tmp_folder)
+        check_sort_keys(self.sort_by, self.out_log, self.__class__.__name__)
+
+        # restore the results from the fpocket cache
+        data = None
+        if self.cache_path:
+            version = self.container_image if self.container_path else get_fpocket_version(self.binary_path)
+            cache_key = get_cache_key(self.io_dict["in"]["input_pdb_path"], self.min_radius, self.max_radius, self.num_spheres, version)
+            data = restore_cached_fpocket(self.cache_path,
+                                          cache_key,
+                                          self.io_dict["out"]["output_pockets_zip"],
+                                          self.io_dict["out"]["output_summary"],
+                                          self.sort_by,
+                                          self.out_log,
+                                          self.top_k)
+
+        if data is None:
+            if self.container_path:
+                tmp_input = str(PurePath(self.container_volume_path).joinpath(PurePath(self.io_dict["in"]["input_pdb_path"]).name))
+                tmp_folder = self.stage_io_dict['unique_dir']
+            else:
+                # create tmp_folder, in the scratch space if given
+                tmp_folder = fu.create_unique_dir(path=self.scratch_path or '')
+                fu.log('Creating %s temporary folder' % tmp_folder, self.out_log)
+                tmp_input = str(PurePath(tmp_folder).joinpath('input.pdb'))
+                # copy input_pdb_path to tmp_folder
+                shutil.copy(self.io_dict["in"]["input_pdb_path"], tmp_input)
+
+            self.tmp_files.append(tmp_folder)
+
+            try:
+                # create cmd
+                self.cmd = [self.binary_path,
+                            '-f', tmp_input]
+
+                # adding extra properties
+                if self.min_radius:
+                    self.cmd.extend(['-m', str(self.min_radius)])
+
+                if self.max_radius:
+                    self.cmd.extend(['-M', str(self.max_radius)])
+
+                if self.num_spheres:
+                    self.cmd.extend(['-i', str(self.num_spheres)])
+
+                fu.log('Executing fpocket', self.out_log, self.global_log)
+
+                # Run Biobb block
+                self.run_biobb()
+
+                # Copy files to host
+                self.copy_to_host()
+
+                data = process_output_fpocket(tmp_folder,
+                                              self.io_dict["out"]["output_pockets_zip"],
+                                              self.io_dict["out"]["output_summary"],
+                                              self.sort_by,
+                                              self.remove_tmp,
+                                              self.container_path,
+                                              self.out_log,
+                                              self.__class__.__name__,
+                                              self.top_k)
+
+                # store the results in the fpocket cache
+                if self.cache_path:
+                    store_cached_fpocket(self.cache_path,
+                                         cache_key,
+                                         tmp_folder,
+                                         self.container_path,
+                                         self.cache_max_size,
+                                         self.out_log)
+            except BaseException:
+                # do not leave the fpocket raw output behind in the scratch space
+                self.remove_tmp_files()
+                raise
+
+        # append pockets to the pockets database
+        if self.db_path:
+            structure_name = self.structure_name or PurePath(self.io_dict["in"]["input_pdb_path"]).stem
+            fu.log('Appending %d pockets of %s to %s database' % (len(data), structure_name, self.db_path), self.out_log)
+            store_pockets(self.db_path, data, structure_name)
+
         self.remove_tmp_files()
 
         return self.return_code
@@ -3,7 +3,7 @@
 """Module containing the FPocketSelect class and the command line interface."""
 from typing import Optional
 import shutil
-from pathlib import PurePath
+import zipfile
 from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
@@ -88,27 +88,27 @@ class FPocketSelect(BiobbObject):
             return 0
         self.stage_files()
 
-        # create tmp_folder
-        tmp_folder = fu.create_unique_dir()
-        fu.log('Creating %s temporary folder' % tmp_folder, self.out_log)
-
-        # decompress the input_pockets_zip file to tmp_folder
-        all_pockets = fu.unzip_list(zip_file=self.io_dict["in"]["input_pockets_zip"], dest_dir=tmp_folder, out_log=self.out_log)
-
-        pockets_list = [i for i in all_pockets if ('pocket' + str(self.pocket)) in i]
-
-        for p in pockets_list:
-            if PurePath(p).suffix == '.pdb':
-                fu.log('Saving %s file' % self.io_dict["out"]["output_pocket_pdb"], self.out_log)
-                shutil.copy(p, self.io_dict["out"]["output_pocket_pdb"])
-            else:
-                fu.log('Saving %s file' % self.io_dict["out"]["output_pocket_pqr"], self.out_log)
-                shutil.copy(p, self.io_dict["out"]["output_pocket_pqr"])
+        # read the pocket files straight from the input_pockets_zip, without extracting the whole archive
+        pocket_name = 'pocket' + str(self.pocket)
+        pocket_files = [(pocket_name + '_atm.pdb', self.io_dict["out"]["output_pocket_pdb"]),
+                        (pocket_name + '_vert.pqr', self.io_dict["out"]["output_pocket_pqr"])]
+
+        with zipfile.ZipFile(self.io_dict["in"]["input_pockets_zip"]) as zip_f:
+            for member, output_path in pocket_files:
+                if not output_path:
+                    continue
+                try:
+                    zip_info = zip_f.getinfo(member)
+                except KeyError:
+                    fu.log(self.__class__.__name__ + ': Pocket %s not found in %s, exiting' % (self.pocket, self.io_dict["in"]["input_pockets_zip"]), self.out_log)
+                    raise SystemExit(self.__class__.__name__ + ': Pocket %s not found in %s' % (self.pocket, self.io_dict["in"]["input_pockets_zip"]))
+                fu.log('Saving %s file' % output_path, self.out_log)
+                with zip_f.open(zip_info) as src, open(output_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
 
         # Copy files to host
         self.copy_to_host()
 
-        self.tmp_files.append(tmp_folder)
         self.remove_tmp_files()
 
         self.check_arguments(output_files_created=True, raise_exception=False)
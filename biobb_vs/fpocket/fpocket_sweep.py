@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+"""Module containing the FPocketSweep class and the command line interface."""
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePath
+import itertools
+import json
+import shutil
+import zipfile
+import numpy as np
+from biobb_common.generic.biobb_object import BiobbObject
+from biobb_common.tools import file_utils as fu
+from biobb_common.tools.file_utils import launchlogger
+from biobb_vs.fpocket.common import FPOCKET_DESCRIPTORS, check_input_path, check_output_path, check_sort_by, read_fpocket_output, run_fpocket, track_pockets
+
+
+class FPocketSweep(BiobbObject):
+    """
+    | biobb_vs FPocketSweep
+    | Wrapper of the fpocket software for parameter sweeps.
+    | Finds the binding sites of the input_pdb_path file via the `fpocket <https://github.com/Discngine/fpocket>`_ software for every combination of the given parameters and reports the consensus pockets with their stability.
+
+    Args:
+        input_pdb_path (str): Path to the PDB structure where the binding site is to be found. File type: input. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/data/fpocket/fpocket_input.pdb>`_. Accepted formats: pdb (edam:format_1476).
+        output_sweep_summary (str): Path to the JSON summary file with the parameter sets and the consensus pockets, sorted by stability. File type: output. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/reference/fpocket/ref_output_sweep_summary.json>`_. Accepted formats: json (edam:format_3464).
+        output_sweep_pockets_zip (str) (Optional): Path to the representative pocket of each consensus pocket. File type: output. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/reference/fpocket/ref_output_sweep_pockets.zip>`_. Accepted formats: zip (edam:format_3987).
+        properties (dic - Python dictionary object containing the tool parameters, not input/output files):
+            * **min_radius** (*list*) - (None) List of minimum radius in Ångstroms an alpha sphere might have in a binding pocket.
+            * **max_radius** (*list*) - (None) List of maximum radius in Ångstroms of alpha spheres in a pocket.
+            * **num_spheres** (*list*) - (None) List of minimum number of alpha spheres a pocket must contain in order to figure in the results.
+            * **overlap_distance** (*float*) - (2.0) [0.1~10|0.1] Distance in Ångstroms under which two alpha sphere centres of pockets of different parameter sets are considered overlapping.
+            * **min_overlap** (*float*) - (0.5) [0~1|0.05] Minimum fraction of overlapping alpha sphere centres for two pockets of different parameter sets to be considered the same pocket.
+            * **sort_by** (*str*) - ('druggability_score') From which property the representative pocket of each consensus pocket will be chosen and ties in stability will be sorted. Any descriptor of the fpocket summary can be used, such as druggability_score (this score intends to assess the likeliness of the pocket to bind a small drug like molecule), score (fpocket score as defined in the `fpocket paper <https://doi.org/10.1186/1471-2105-10-168>`_) or volume (volume of the pocket).
+            * **num_workers** (*int*) - (1) [1~1000|1] Number of fpocket processes run in parallel.
+            * **binary_path** (*string*) - ('fpocket') path to fpocket in your local computer.
+            * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
+            * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
+            * **sandbox_path** (*str*) - ("./") [WF property] Parent path to the sandbox directory.
+
+    Examples:
+        This is a use example of how to use the building block from Python::
+
+            from biobb_vs.fpocket.fpocket_sweep import fpocket_sweep
+            prop = {
+                'min_radius': [3, 3.4],
+                'max_radius': [6, 7],
+                'num_spheres': [15, 35],
+                'num_workers': 8
+            }
+            fpocket_sweep(input_pdb_path='/path/to/myStructure.pdb',
+                    output_sweep_summary='/path/to/newSummary.json',
+                    output_sweep_pockets_zip='/path/to/newPockets.zip',
+                    properties=prop)
+
+    Info:
+        * wrapped_software:
+            * name: fpocket
+            * version: ==4.1
+            * license: MIT
+        * ontology:
+            * name: EDAM
+            * schema: http://edamontology.org/EDAM.owl
+
+    """
+
+    def __init__(self, input_pdb_path, output_sweep_summary, output_sweep_pockets_zip=None,
+                 properties=None, **kwargs) -> None:
+        properties = properties or {}
+
+        # Call parent class constructor
+        super().__init__(properties)
+        self.locals_var_dict = locals().copy()
+
+        # Input/Output files
+        self.io_dict = {
+            "in": {"input_pdb_path": input_pdb_path},
+            "out": {"output_sweep_summary": output_sweep_summary, "output_sweep_pockets_zip": output_sweep_pockets_zip}
+        }
+
+        # Properties specific for BB
+        self.binary_path = properties.get('binary_path', 'fpocket')
+        self.min_radius = properties.get('min_radius', None)
+        self.max_radius = properties.get('max_radius', None)
+        self.num_spheres = properties.get('num_spheres', None)
+        self.overlap_distance = float(properties.get('overlap_distance', 2.0))
+        self.min_overlap = float(properties.get('min_overlap', 0.5))
+        self.sort_by = properties.get('sort_by', 'druggability_score')
+        self.num_workers = int(properties.get('num_workers', 1))
+        self.properties = properties
+
+        # Check the properties
+        self.check_properties(properties)
+        self.check_arguments()
+
+    def check_data_params(self, out_log, err_log):
+        """ Checks all the input/output paths and parameters """
+        self.io_dict["in"]["input_pdb_path"] = check_input_path(self.io_dict["in"]["input_pdb_path"], "input_pdb_path", out_log, self.__class__.__name__)
+        self.io_dict["out"]["output_sweep_summary"] = check_output_path(self.io_dict["out"]["output_sweep_summary"], "output_sweep_summary", False, out_log, self.__class__.__name__)
+        self.io_dict["out"]["output_sweep_pockets_zip"] = check_output_path(self.io_dict["out"]["output_sweep_pockets_zip"], "output_sweep_pockets_zip", True, out_log, self.__class__.__name__)
+
+    def run_setting(self, setting):
+        """ Runs fpocket with a single parameter set and returns its output folder """
+
+        tmp_input, min_radius, max_radius, num_spheres = setting
+        path = run_fpocket(self.binary_path, tmp_input, min_radius, max_radius, num_spheres)
+        if not path:
+            fu.log(self.__class__.__name__ + ': Error executing fpocket with min_radius %s, max_radius %s and num_spheres %s, please check your properties' % setting[1:], self.out_log)
+            raise SystemExit(self.__class__.__name__ + ': Error executing fpocket with min_radius %s, max_radius %s and num_spheres %s, please check your properties' % setting[1:])
+
+        return path
+
+    @launchlogger
+    def launch(self) -> int:
+        """Execute the :class:`FPocketSweep <fpocket.fpocket_sweep.FPocketSweep>` fpocket.fpocket_sweep.FPocketSweep object."""
+
+        # check input/output paths and parameters
+        self.check_data_params(self.out_log, self.err_log)
+
+        # Setup Biobb
+        if self.check_restart():
+            return 0
+        self.stage_files()
+
+        check_sort_by(self.sort_by, self.out_log, self.__class__.__name__)
+
+        # create tmp_folder
+        tmp_folder = fu.create_unique_dir()
+        fu.log('Creating %s temporary folder' % tmp_folder, self.out_log)
+        self.tmp_files.append(tmp_folder)
+
+        # parameters grid, one copy of the input structure per parameter set
+        grid = list(itertools.product(*[v if isinstance(v, list) else [v] for v in (self.min_radius, self.max_radius, self.num_spheres)]))
+        settings = []
+        for i, params in enumerate(grid):
+            tmp_input = str(PurePath(tmp_folder).joinpath('input%d.pdb' % (i + 1)))
+            shutil.copy(self.io_dict["in"]["input_pdb_path"], tmp_input)
+            settings.append((tmp_input,) + params)
+
+        fu.log('Executing fpocket with %d parameter sets and %d workers' % (len(settings), self.num_workers), self.out_log, self.global_log)
+
+        # fpocket runs as an external process, so threads are enough to keep the workers busy
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            paths = list(executor.map(self.run_setting, settings))
+        results = [read_fpocket_output(path) for path in paths]
+
+        # match the pockets across parameter sets
+        tracks = track_pockets([centres for _, centres in results], self.overlap_distance, self.min_overlap)
+        fu.log('%d consensus pockets found along %d parameter sets' % (len(tracks), len(settings)), self.out_log)
+
+        pockets = []
+        settings_pockets = [list(data.items()) for data, _ in results]
+        for track in tracks:
+            members = [(s, settings_pockets[s][p]) for s, p in enumerate(track) if p >= 0]
+            # representative pocket: the best one by sort_by
+            best = max(members, key=lambda member: float(member[1][1][self.sort_by]))
+            pocket: dict = {
+                'stability': round(len(members) / len(settings), 3),
+                # pocket of each parameter set, None where absent
+                'members': [settings_pockets[s][p][0] if p >= 0 else None for s, p in enumerate(track)],
+                'representative': {'setting': best[0], 'pocket': best[1][0]}
+            }
+            for name, _ in FPOCKET_DESCRIPTORS:
+                values = [descriptors[name] for _, (_, descriptors) in members if name in descriptors]
+                pocket[name] = round(float(np.mean(values)), 3) if values else None
+            pockets.append(pocket)
+
+        # most stable pockets first, then by sort_by
+        pockets.sort(key=lambda pocket: (-pocket['stability'], -(pocket[self.sort_by] or 0)))
+
+        summary: dict = {
+            'settings': [{'min_radius': params[0], 'max_radius': params[1], 'num_spheres': params[2], 'num_pockets': len(data)} for params, (data, _) in zip(grid, results)],
+            'pockets': {'pocket%d' % (i + 1): pocket for i, pocket in enumerate(pockets)}
+        }
+
+        fu.log('Saving summary to %s file' % self.io_dict["out"]["output_sweep_summary"], self.out_log)
+        with open(self.io_dict["out"]["output_sweep_summary"], 'w') as outfile:
+            json.dump(summary, outfile, indent=4)
+
+        # representative pocket files of each consensus pocket
+        if self.io_dict["out"]["output_sweep_pockets_zip"]:
+            fu.log('Saving representative pockets to %s file' % self.io_dict["out"]["output_sweep_pockets_zip"], self.out_log)
+            with zipfile.ZipFile(self.io_dict["out"]["output_sweep_pockets_zip"], 'w', zipfile.ZIP_DEFLATED) as zip_out:
+                for name, pocket in summary['pockets'].items():
+                    representative = pocket['representative']
+                    for suffix in ('_atm.pdb', '_vert.pqr'):
+                        zip_out.write(paths[representative['setting']].joinpath('pockets', representative['pocket'] + suffix), name + suffix)
+
+        # Copy files to host
+        self.copy_to_host()
+
+        self.remove_tmp_files()
+
+        self.check_arguments(output_files_created=True, raise_exception=False)
+
+        return 0
+
+
+def fpocket_sweep(input_pdb_path: str, output_sweep_summary: str, output_sweep_pockets_zip: Optional[str] = None, properties: Optional[dict] = None, **kwargs) -> int:
+    """Create the :class:`FPocketSweep <fpocket.fpocket_sweep.FPocketSweep>` class and
+    execute the :meth:`launch() <fpocket.fpocket_sweep.FPocketSweep.launch>` method."""
+    return FPocketSweep(**dict(locals())).launch()
+
+
+fpocket_sweep.__doc__ = FPocketSweep.__doc__
+main = FPocketSweep.get_main(fpocket_sweep, "Finds the binding sites of the input_pdb_path file via the fpocket software for every combination of the given parameters and reports the consensus pockets with their stability.")
+
+
+if __name__ == '__main__':
+    main()
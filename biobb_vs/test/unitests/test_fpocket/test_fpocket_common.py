@@ -0,0 +1,65 @@
+# type: ignore
+import tempfile
+import zipfile
+from pathlib import Path
+import numpy as np
+from biobb_vs.fpocket.common import FPOCKET_DESCRIPTORS, evaluate_expression, expression_to_sql, pockets_geometry, query_pockets_db, read_pocket_spheres, read_pockets_spheres, store_pockets, summary_to_array
+
+
+class TestPocketsExpressions():
+    def setup_class(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp_dir.name).joinpath('pockets.db')
+        self.data = {
+            'pocket%d' % (i + 1): {'score': 0.1 * i, 'druggability_score': 0.05 * i, 'volume': 100.0 + 10 * i, 'number_of_alpha_spheres': 10 + i, 'polarity_score': i % 4 + 1, 'charge_score': i % 3 - 1}
+            for i in range(12)
+        }
+        # pocket without the integer descriptors
+        self.data['pocket13'] = {'score': 0.5, 'druggability_score': 0.5, 'volume': 150.0, 'number_of_alpha_spheres': 20}
+        store_pockets(self.db_path, self.data, 'structure')
+        self.table = summary_to_array({pocket: descriptors for pocket, descriptors in self.data.items() if pocket != 'pocket13'})
+
+    def teardown_class(self):
+        self.tmp_dir.cleanup()
+
+    def test_division(self):
+        names = [name for name, _ in FPOCKET_DESCRIPTORS]
+        expression = 'number_of_alpha_spheres / polarity_score > 5.5 and polarity_score / 2 < 1.5'
+        assert '/' in expression_to_sql(expression, names)
+        expected = set(self.table['pocket'][evaluate_expression(self.table, expression)])
+        assert expected
+        assert set(query_pockets_db(self.db_path, queries=[expression])['pocket']) == expected
+
+    def test_missing_integer_descriptors(self):
+        pockets = set(query_pockets_db(self.db_path, queries=['polarity_score > -10', 'charge_score < 10'])['pocket'])
+        assert pockets == set(self.table['pocket'])
+        assert 'pocket13' in set(query_pockets_db(self.db_path, queries=['number_of_alpha_spheres >= 20'])['pocket'])
+
+
+class TestPocketsSpheres():
+    def setup_class(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.zip_path = Path(self.tmp_dir.name).joinpath('pockets.zip')
+        # pocket2 without its alpha spheres file
+        with zipfile.ZipFile(Path(__file__).parents[2].joinpath('data', 'fpocket', 'input_pockets.zip')) as zip_in, zipfile.ZipFile(self.zip_path, 'w') as zip_out:
+            self.spheres = {}
+            for name in zip_in.namelist():
+                if name == 'pocket2_vert.pqr':
+                    continue
+                zip_out.writestr(name, zip_in.read(name))
+                if name.endswith('_vert.pqr'):
+                    self.spheres[name.split('_')[0]] = read_pocket_spheres(zip_in.read(name))
+
+    def teardown_class(self):
+        self.tmp_dir.cleanup()
+
+    def test_pocket_without_spheres(self):
+        with zipfile.ZipFile(self.zip_path) as zip_f:
+            names, spheres, labels = read_pockets_spheres(zip_f)
+        assert 'pocket2' in names
+        for i, name in enumerate(names):
+            assert np.array_equal(spheres[labels == i], self.spheres.get(name, np.zeros((0, 4))))
+        geometry = pockets_geometry(spheres, labels, len(names))
+        empty = names.index('pocket2')
+        assert all(np.isnan(values[empty]).all() for values in geometry.values())
+        assert not any(np.isnan(np.delete(values, empty, axis=0)).any() for values in geometry.values())
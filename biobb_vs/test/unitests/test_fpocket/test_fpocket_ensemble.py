@@ -0,0 +1,48 @@
+# type: ignore
+import tempfile
+import zipfile
+from pathlib import Path
+import numpy as np
+from biobb_common.tools import test_fixtures as fx
+from biobb_vs.fpocket.common import extract_frames
+from biobb_vs.fpocket.fpocket_ensemble import fpocket_ensemble
+
+
+class TestFPocketEnsemble():
+    def setup_class(self):
+        fx.test_setup(self, 'fpocket_ensemble')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def test_fpocket_ensemble(self):
+        fpocket_ensemble(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_ensemble_npz'])
+        with np.load(self.paths['output_ensemble_npz']) as output, np.load(self.paths['ref_output_ensemble_npz']) as ref:
+            assert sorted(output.files) == sorted(ref.files)
+            # pockets tracks and their descriptors time series
+            for name in ('frames', 'pockets', 'frame_pocket'):
+                assert np.array_equal(output[name], ref[name])
+            for name in set(ref.files) - {'frames', 'pockets', 'frame_pocket'}:
+                assert np.allclose(output[name], ref[name], equal_nan=True)
+
+
+class TestExtractFrames():
+    def setup_class(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def teardown_class(self):
+        self.tmp_dir.cleanup()
+
+    def test_extract_frames_order(self):
+        # unpadded frame names, whose string order is not the ensemble one
+        names = ['frame1', 'frame2', 'frame10']
+        ensemble_path = str(Path(self.tmp_dir.name).joinpath('ensemble.zip'))
+        with zipfile.ZipFile(ensemble_path, 'w') as zip_f:
+            for i, name in enumerate(names):
+                zip_f.writestr(name + '.pdb', 'REMARK %d\nEND\n' % i)
+        frames = extract_frames(ensemble_path, self.tmp_dir.name)
+        assert [name for name, _ in frames] == names
+        for i, (_, frame_path) in enumerate(frames):
+            assert Path(frame_path).read_text() == 'REMARK %d\nEND\n' % i
@@ -15,3 +15,17 @@ class TestFPocketFilter():
         fpocket_filter(properties=self.properties, **self.paths)
         assert fx.not_empty(self.paths['output_filter_pockets_zip'])
         assert fx.equal(self.paths['output_filter_pockets_zip'], self.paths['ref_output_filter_pockets_zip'])
+
+
+class TestFPocketFilterQuery():
+    def setup_class(self):
+        fx.test_setup(self, 'fpocket_filter_query')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def test_fpocket_filter_query(self):
+        fpocket_filter(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_filter_pockets_zip'])
+        assert fx.equal(self.paths['output_filter_pockets_zip'], self.paths['ref_output_filter_pockets_zip'])
@@ -0,0 +1,17 @@
+# type: ignore
+from biobb_common.tools import test_fixtures as fx
+from biobb_vs.fpocket.fpocket_geometry import fpocket_geometry
+
+
+class TestFPocketGeometry():
+    def setup_class(self):
+        fx.test_setup(self, 'fpocket_geometry')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def test_fpocket_geometry(self):
+        fpocket_geometry(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_geometry'])
+        assert fx.equal(self.paths['output_geometry'], self.paths['ref_output_geometry'])
@@ -0,0 +1,17 @@
+# type: ignore
+from biobb_common.tools import test_fixtures as fx
+from biobb_vs.fpocket.fpocket_query import fpocket_query
+
+
+class TestFPocketQuery():
+    def setup_class(self):
+        fx.test_setup(self, 'fpocket_query')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def test_fpocket_query(self):
+        fpocket_query(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_query_summary'])
+        assert fx.equal(self.paths['output_query_summary'], self.paths['ref_output_query_summary'])
@@ -1,4 +1,7 @@
 # type: ignore
+import json
+import zipfile
+from pathlib import Path
 from biobb_common.tools import test_fixtures as fx
 from biobb_vs.fpocket.fpocket_run import fpocket_run
 
@@ -17,3 +20,61 @@ class TestFPocketRun():
         # assert fx.equal(self.paths['output_pockets_zip'], self.paths['ref_output_pockets_zip'])
         assert fx.not_empty(self.paths['output_summary'])
         # assert fx.equal(self.paths['output_summary'], self.paths['ref_output_summary'])
+
+
+class TestFPocketRunCache():
+    def setup_class(self):
+        fx.test_setup(self, 'fpocket_run_cache')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def test_fpocket_run_cache(self):
+        fpocket_run(properties=self.properties, **self.paths)
+        assert len(list(Path(self.properties['cache_path']).iterdir())) == 1
+        with open(self.paths['output_summary']) as f:
+            summary = json.load(f)
+        Path(self.paths['output_pockets_zip']).unlink()
+        Path(self.paths['output_summary']).unlink()
+        # restored from the cache
+        fpocket_run(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_pockets_zip'])
+        assert fx.not_empty(self.paths['output_summary'])
+        with open(self.paths['output_summary']) as f:
+            assert json.load(f) == summary
+
+
+class TestFPocketRunTopK():
+    def setup_class(self):
+        fx.test_setup(self, 'fpocket_run_top_k')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def test_fpocket_run_top_k(self):
+        fpocket_run(properties=self.properties, **self.paths)
+        with open(self.paths['output_summary']) as f:
+            summary = json.load(f)
+        assert len(summary) <= self.properties['top_k']
+        scores = [pocket['druggability_score'] for pocket in summary.values()]
+        assert scores == sorted(scores, reverse=True)
+        with zipfile.ZipFile(self.paths['output_pockets_zip']) as zip_f:
+            assert {name.split('_')[0] for name in zip_f.namelist()} == set(summary)
+
+
+class TestFPocketRunScratch():
+    def setup_class(self):
+        fx.test_setup(self, 'fpocket_run_scratch')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def test_fpocket_run_scratch(self):
+        fpocket_run(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_pockets_zip'])
+        assert fx.not_empty(self.paths['output_summary'])
+        # the fpocket raw output is removed from the scratch space
+        assert not list(Path(self.properties['scratch_path']).iterdir())
@@ -0,0 +1,26 @@
+# type: ignore
+import json
+import zipfile
+from biobb_common.tools import test_fixtures as fx
+from biobb_vs.fpocket.fpocket_sweep import fpocket_sweep
+
+
+class TestFPocketSweep():
+    def setup_class(self):
+        fx.test_setup(self, 'fpocket_sweep')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def test_fpocket_sweep(self):
+        fpocket_sweep(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_sweep_summary'])
+        with open(self.paths['output_sweep_summary']) as f, open(self.paths['ref_output_sweep_summary']) as f_ref:
+            assert json.load(f) == json.load(f_ref)
+        assert fx.not_empty(self.paths['output_sweep_pockets_zip'])
+        # representative pocket files of each consensus pocket
+        with zipfile.ZipFile(self.paths['output_sweep_pockets_zip']) as zip_out, zipfile.ZipFile(self.paths['ref_output_sweep_pockets_zip']) as zip_ref:
+            assert sorted(zip_out.namelist()) == sorted(zip_ref.namelist())
+            for name in zip_ref.namelist():
+                assert zip_out.read(name) == zip_ref.read(name)
@@ -1,6 +1,15 @@
 # type: ignore
+import json
+import os
+import tempfile
+import zipfile
+from io import StringIO
+from pathlib import Path, PurePath
+import numpy as np
+import pytest
+import Bio.PDB
 from biobb_common.tools import test_fixtures as fx
-from biobb_vs.utils.bindingsite import bindingsite
+from biobb_vs.utils.bindingsite import BindingSite, bindingsite
 
 
 class TestBindingSite():
@@ -15,3 +24,138 @@ class TestBindingSite():
         bindingsite(properties=self.properties, **self.paths)
         assert fx.not_empty(self.paths['output_pdb_path'])
         assert fx.equal(self.paths['output_pdb_path'], self.paths['ref_output_pdb_path'])
+
+
+class TestBindingSiteCluster():
+    def setup_class(self):
+        fx.test_setup(self, 'bindingsite_cluster')
+        self.het_groups_path = self.paths.pop('het_groups_path')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def run_bindingsite(self, output_name, **properties):
+        paths = dict(self.paths,
+                     output_pdb_path=output_name + '.pdb',
+                     output_occupancy_path=output_name + '.json')
+        bindingsite(properties=dict(self.properties, **properties), **paths)
+        with open(paths['output_occupancy_path']) as f:
+            return Path(paths['output_pdb_path']).read_text(), json.load(f)
+
+    def test_bindingsite_cluster(self):
+        bindingsite(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_pdb_path'])
+        assert fx.equal(self.paths['output_pdb_path'], self.paths['ref_output_pdb_path'])
+        with open(self.paths['output_occupancy_path']) as f, open(self.paths['ref_output_occupancy_path']) as ref_f:
+            occupancy, ref_occupancy = json.load(f), json.load(ref_f)
+        # a member without ligands is ignored
+        assert occupancy['bindingsite_target']['num_ligands'] == ref_occupancy['bindingsite_target']['num_ligands'] == 6
+        assert occupancy['bindingsite_target']['residues'] == ref_occupancy['bindingsite_target']['residues']
+        assert np.allclose(occupancy['bindingsite_target']['centroid'], ref_occupancy['bindingsite_target']['centroid'], atol=1e-3)
+
+    def test_bindingsite_num_workers(self):
+        # the same members are accepted whatever the number of workers, also with the max_num_ligands cut-off
+        for max_num_ligands in (15, 2):
+            sequential = self.run_bindingsite('sequential_%d' % max_num_ligands, max_num_ligands=max_num_ligands, num_workers=1)
+            parallel = self.run_bindingsite('parallel_%d' % max_num_ligands, max_num_ligands=max_num_ligands, num_workers=3)
+            assert sequential == parallel
+        assert parallel[1]['bindingsite_target']['num_ligands'] < 6
+
+    def test_bindingsite_cache(self):
+        cache_path = str(Path(self.properties['path']).joinpath('cache'))
+        uncached = self.run_bindingsite('uncached')
+        cold = self.run_bindingsite('cold', cache_path=cache_path)
+        members = sorted(Path(cache_path).glob('*.member'))
+        # the members without candidate ligands are not parsed
+        assert len(members) == 6
+        warm = self.run_bindingsite('warm', cache_path=cache_path)
+        assert sorted(Path(cache_path).glob('*.member')) == members
+        assert uncached == cold == warm
+
+    def test_bindingsite_het_groups(self):
+        # PGA classified as an ion: only the members with another ligand are accepted
+        _, occupancy = self.run_bindingsite('het_groups', het_groups_path=self.het_groups_path)
+        assert occupancy['bindingsite_target']['num_ligands'] == 2
+        _, occupancy = self.run_bindingsite('het_groups_pga', het_groups_path=self.het_groups_path, ligand='PGA', num_workers=2)
+        assert occupancy['bindingsite_target']['num_ligands'] == 0
+        assert occupancy['bindingsite_target']['residues'] == []
+
+
+class TestBindingSiteTargets():
+    def setup_class(self):
+        fx.test_setup(self, 'bindingsite_targets')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def test_bindingsite_targets(self):
+        bindingsite(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_pdb_path'])
+        # one binding site by structure and chain, named after the structure path within the input zip file
+        names = ['a/target_A.pdb', 'b/target_A.pdb', 'b/target_B.pdb']
+        with zipfile.ZipFile(self.paths['output_pdb_path']) as output, zipfile.ZipFile(self.paths['ref_output_pdb_path']) as ref:
+            assert output.namelist() == names
+            for name in names:
+                assert output.read(name) == ref.read(name)
+        with open(self.paths['output_occupancy_path']) as f:
+            occupancy = json.load(f)
+        assert list(occupancy) == [PurePath(name).with_suffix('').as_posix() for name in names]
+        assert all(occupancy[name]['num_ligands'] == 6 for name in occupancy)
+
+    def test_bindingsite_duplicated_targets(self):
+        input_pdb_path = str(Path(self.properties['path']).joinpath('duplicated.zip'))
+        with zipfile.ZipFile(self.paths['input_pdb_path']) as zip_in, zipfile.ZipFile(input_pdb_path, 'w') as zip_out:
+            zip_out.writestr('target.pdb', zip_in.read('a/target.pdb'))
+            zip_out.writestr('target.ent', zip_in.read('b/target.pdb'))
+        with pytest.raises(SystemExit):
+            bindingsite(properties=self.properties, **dict(self.paths, input_pdb_path=input_pdb_path, output_pdb_path='duplicated_output.zip'))
+
+
+class TestBindingSiteOccupancy():
+    def setup_class(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # the working directory of the previous tests is removed on their teardown
+        os.chdir(self.tmp_dir.name)
+        input_pdb_path = str(Path(__file__).parents[2].joinpath('data', 'utils', 'bindingsite.pdb'))
+        input_clusters_zip = str(Path(self.tmp_dir.name).joinpath('clusters.zip'))
+        zipfile.ZipFile(input_clusters_zip, 'w').close()
+        self.bindingsite = BindingSite(input_pdb_path=input_pdb_path,
+                                       input_clusters_zip=input_clusters_zip,
+                                       output_pdb_path=str(Path(self.tmp_dir.name).joinpath('output.pdb')),
+                                       properties={'radius': 5.0, 'min_frequency': 0.3})
+        self.chain = Bio.PDB.PDBParser(QUIET=True).get_structure('structure', input_pdb_path)[0]['A']
+        # superimposed ligands of a synthetic cluster: poses of a 6 atoms ligand around a few residues, some of them repeated
+        rng = np.random.default_rng(0)
+        residues = list(self.chain.get_residues())
+        self.ligands = [np.array([atom.get_coord() for atom in residues[i]], dtype=np.float64)[:1] + rng.normal(0, 2.0, (6, 3))
+                        for i in (100, 100, 102, 104, 100, 250, 102, 100)]
+
+    def teardown_class(self):
+        os.chdir(Path(__file__).parent)
+        self.tmp_dir.cleanup()
+
+    def test_bindingsite_occupancy(self):
+        # brute force contact frequencies
+        expected = {}
+        for res in self.chain.get_residues():
+            coords = np.array([atom.get_coord() for atom in res], dtype=np.float64)
+            contacts = [(np.linalg.norm(coords[:, None] - ligand[None], axis=2) <= 5.0).any() for ligand in self.ligands]
+            if np.mean(contacts) >= 0.3:
+                expected[res.get_id()] = np.mean(contacts)
+
+        frequency = self.bindingsite.get_binding_site_residues(self.chain, self.ligands)
+        assert frequency.keys() == expected.keys()
+        assert all(np.isclose(frequency[res_id], expected[res_id]) for res_id in expected)
+
+        residues = self.bindingsite.save_binding_site(self.chain, frequency, StringIO())
+        occupancy = self.bindingsite.get_occupancy(residues, frequency, len(self.ligands))
+        assert occupancy['num_ligands'] == len(self.ligands)
+        assert [(res['chain'], res['resnum']) for res in occupancy['residues']] == [('A', res.get_id()[1]) for res in residues]
+        assert all(np.isclose(res['frequency'], expected[r.get_id()], atol=1e-3) for res, r in zip(occupancy['residues'], residues))
+        # centroid of the residues centres weighted by their contact frequency
+        centres = np.array([np.mean([atom.get_coord() for atom in res], axis=0) for res in residues])
+        weights = np.array([expected[res.get_id()] for res in residues])
+        assert np.allclose(occupancy['centroid'], weights @ centres / weights.sum(), atol=1e-3)
+        json.dumps(occupancy)
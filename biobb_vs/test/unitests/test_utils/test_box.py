@@ -1,4 +1,6 @@
 # type: ignore
+from pathlib import Path
+import numpy as np
 from biobb_common.tools import test_fixtures as fx
 from biobb_vs.utils.box import box
 
@@ -15,3 +17,18 @@ class TestBox():
         box(properties=self.properties, **self.paths)
         assert fx.not_empty(self.paths['output_pdb_path'])
         assert fx.equal_txt(self.paths['output_pdb_path'], self.paths['ref_output_pdb_path'])
+
+    def test_box_full_columns(self):
+        # x coordinates filling column 31, the first one of their field
+        coords = np.array([[-999.999, 10.0, 20.0], [-990.5, 12.5, 21.0], [-995.25, 11.0, 25.0]])
+        input_pdb_path = str(Path(self.properties['path']).joinpath('input_box_full_columns.pdb'))
+        with open(input_pdb_path, 'w') as f:
+            for i, (x, y, z) in enumerate(coords):
+                f.write('ATOM  %5d  CA  ALA A%4d    %8.3f%8.3f%8.3f  1.00  0.00           C\n' % (i + 1, i + 1, x, y, z))
+        output_pdb_path = str(Path(self.properties['path']).joinpath('output_box_full_columns.pdb'))
+        box(input_pdb_path=input_pdb_path, output_pdb_path=output_pdb_path, properties=self.properties)
+        remark = Path(output_pdb_path).read_text().splitlines()[0].split()
+        center = coords.mean(axis=0)
+        size = coords.max(axis=0) - center + self.properties['offset']
+        assert np.allclose([float(v) for v in remark[3:6]], center, atol=1e-3)
+        assert np.allclose([float(v) for v in remark[7:10]], size, atol=1e-3)
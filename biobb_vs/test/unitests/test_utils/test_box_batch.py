@@ -0,0 +1,24 @@
+# type: ignore
+import zipfile
+from biobb_common.tools import test_fixtures as fx
+from biobb_vs.utils.box_batch import box_batch
+
+
+class TestBoxBatch():
+    def setup_class(self):
+        fx.test_setup(self, 'box_batch')
+
+    def teardown_class(self):
+        fx.test_teardown(self)
+        pass
+
+    def test_box_batch(self):
+        box_batch(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_boxes_path'])
+        assert fx.equal(self.paths['output_boxes_path'], self.paths['ref_output_boxes_path'])
+        assert fx.not_empty(self.paths['output_boxes_zip'])
+        # the box PDB files only hold REMARKs and box HETATM records, compared as text
+        with zipfile.ZipFile(self.paths['output_boxes_zip']) as zip_out, zipfile.ZipFile(self.paths['ref_output_boxes_zip']) as zip_ref:
+            assert zip_out.namelist() == zip_ref.namelist()
+            for name in zip_ref.namelist():
+                assert zip_out.read(name) == zip_ref.read(name)
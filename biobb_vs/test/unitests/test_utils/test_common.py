@@ -0,0 +1,169 @@
+# type: ignore
+import warnings
+from io import StringIO
+import numpy as np
+import pytest
+import Bio.Align.substitution_matrices
+import Bio.PDB
+from Bio.SVDSuperimposer import SVDSuperimposer
+from biobb_vs.utils.common import (
+    HetGroupIndex,
+    align_sequences,
+    get_het_group_index,
+    get_ligand_residues,
+    get_ligand_resnames,
+    read_coordinates,
+    search_neighbor_atoms,
+    search_neighbor_pairs,
+    superimpose_coordinates,
+)
+
+
+class TestSearchNeighbors():
+    def setup_class(self):
+        rng = np.random.default_rng(0)
+        self.atoms = rng.uniform(0, 30, size=(2000, 3))
+        queries = rng.uniform(10, 20, size=(60, 3))
+        # repeated queries, as superimposed copies of the same ligand
+        self.queries = np.concatenate([queries, queries[:20], self.atoms[:5]])
+        self.radius = 4.0
+        distances = np.linalg.norm(self.atoms[:, None] - self.queries[None], axis=2)
+        self.pairs = set(zip(*np.nonzero(distances <= self.radius)))
+
+    def test_search_neighbor_pairs(self):
+        atom_indices, query_indices = search_neighbor_pairs(self.atoms, self.queries, self.radius)
+        pairs = list(zip(atom_indices, query_indices))
+        assert len(pairs) == len(set(pairs))
+        assert set(pairs) == self.pairs
+
+    def test_search_neighbor_atoms(self):
+        mask = search_neighbor_atoms(self.atoms, self.queries, self.radius)
+        assert set(np.flatnonzero(mask)) == {atom for atom, _ in self.pairs}
+
+    def test_search_neighbor_empty(self):
+        atom_indices, query_indices = search_neighbor_pairs(self.atoms, self.queries + 1000, self.radius)
+        assert not len(atom_indices) and not len(query_indices)
+
+
+def pdb_record(record, serial, name, resname, chain, resnum, coords):
+    return '%-6s%5d %-4s %3s %s%4d    %8.3f%8.3f%8.3f  1.00  0.00\n' % (record, serial, name, resname, chain, resnum, *coords)
+
+
+def pdb_residues(residues):
+    """ PDB file contents (bytes) of the (record, resname, chain, resnum, number of atoms) residues, MODEL and ENDMDL lines are kept as they are """
+    lines = []
+    for residue in residues:
+        if isinstance(residue, str):
+            lines.append(residue + '\n')
+            continue
+        record, resname, chain, resnum, atoms = residue
+        for i in range(atoms):
+            lines.append(pdb_record(record, len(lines) + 1, 'C%d' % (i + 1), resname, chain, resnum, (resnum, i, 0.0)))
+    return ''.join(lines).encode()
+
+
+class TestLigandResnames():
+    def setup_class(self):
+        protein = [('ATOM', 'ALA', 'A', 1, 5), ('ATOM', 'GLY', 'A', 2, 4)]
+        self.pdb_data = {
+            'waters_ions': protein + [('HETATM', 'HOH', 'A', 101, 1), ('HETATM', 'WAT', 'A', 102, 1),
+                                      ('HETATM', ' NA', 'A', 103, 1), ('HETATM', 'SO4', 'A', 104, 5)],
+            'modres': protein + [('HETATM', 'MSE', 'A', 3, 8), ('HETATM', 'SEP', 'A', 4, 10), ('HETATM', 'HOH', 'A', 101, 1)],
+            'ligands': protein + [('HETATM', 'ATP', 'A', 101, 31), ('HETATM', 'DOD', 'A', 102, 1),
+                                  ('HETATM', ' ZN', 'A', 103, 1), ('HETATM', 'GOL', 'A', 104, 6)],
+            # ligands in any chain, not only the one used to superimpose the member
+            'chains': protein + [('HETATM', 'PGA', 'A', 101, 9), ('ATOM', 'ALA', 'B', 1, 5),
+                                 ('HETATM', 'HOH', 'B', 101, 1), ('HETATM', 'LIG', 'B', 102, 6)],
+            # only the first model is parsed
+            'models': ['MODEL        1'] + protein + [('HETATM', 'HOH', 'A', 101, 1), ('HETATM', 'MSE', 'A', 3, 8), 'ENDMDL',
+                                                      'MODEL        2'] + protein + [('HETATM', 'ATP', 'A', 101, 31), 'ENDMDL'],
+        }
+        self.pdb_data = {name: pdb_residues(residues) for name, residues in self.pdb_data.items()}
+
+    def ligand_residues(self, pdb_data, het_groups=None):
+        model = Bio.PDB.PDBParser(QUIET=True).get_structure('member', StringIO(pdb_data.decode()))[0]
+        return {res.get_resname().strip() for chain in model for res in get_ligand_residues(chain, het_groups=het_groups)}
+
+    def test_ligand_resnames(self):
+        expected = {'waters_ions': set(), 'modres': set(), 'ligands': {'ATP', 'DOD', 'GOL'}, 'chains': {'PGA', 'LIG'}, 'models': set()}
+        for name, pdb_data in self.pdb_data.items():
+            assert get_ligand_resnames(pdb_data) == self.ligand_residues(pdb_data) == expected[name], name
+
+    def test_ligand_resnames_het_groups(self):
+        het_groups = get_het_group_index().extend({'ATP': HetGroupIndex.ION, 'SO4': HetGroupIndex.LIGAND, 'LIG': HetGroupIndex.MODRES})
+        for name, pdb_data in self.pdb_data.items():
+            assert get_ligand_resnames(pdb_data, het_groups) == self.ligand_residues(pdb_data, het_groups), name
+        assert get_ligand_resnames(self.pdb_data['waters_ions'], het_groups) == {'SO4'}
+
+
+class TestReadCoordinates():
+    def test_read_coordinates_full_columns(self):
+        # coordinates filling the whole 8 characters of their fields, starting at columns 31, 39 and 47
+        pdb_data = (pdb_record('ATOM', 1, 'CA', 'ALA', 'A', 1, (-999.999, 1234.567, -99.999))
+                    + 'TER\n'
+                    + pdb_record('HETATM', 2, 'C1', 'LIG', 'A', 101, (9999.999, -999.999, 0.001))).encode()
+        coords = read_coordinates(pdb_data)
+        assert coords.shape == (2, 3)
+        assert np.array_equal(coords, [[-999.999, 1234.567, -99.999], [9999.999, -999.999, 0.001]])
+
+
+class TestSuperimposeCoordinates():
+    def test_superimpose_coordinates(self):
+        rng = np.random.default_rng(0)
+        fixed_coords, moving_coords = [], []
+        for length in (3, 10, 57):
+            fixed = rng.uniform(-30, 30, size=(length, 3))
+            rotation, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+            fixed_coords.append(fixed)
+            moving_coords.append(fixed @ rotation + rng.uniform(-10, 10, 3) + rng.normal(0, 0.5, size=(length, 3)))
+
+        rot, tran, rms = superimpose_coordinates(fixed_coords, moving_coords)
+        for i, (fixed, moving) in enumerate(zip(fixed_coords, moving_coords)):
+            sup = SVDSuperimposer()
+            sup.set(fixed, moving)
+            sup.run()
+            sup_rot, sup_tran = sup.get_rotran()
+            assert np.allclose(rot[i], sup_rot, rtol=0, atol=1e-12)
+            assert np.allclose(tran[i], sup_tran, rtol=0, atol=1e-10)
+            assert np.isclose(rms[i], sup.get_rms(), rtol=0, atol=1e-12)
+
+    def test_superimpose_coordinates_empty(self):
+        rot, tran, rms = superimpose_coordinates([], [])
+        assert rot.shape == (0, 3, 3) and tran.shape == (0, 3) and rms.shape == (0,)
+
+
+class TestAlignSequences():
+    def setup_class(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.pairwise2 = pytest.importorskip('Bio.pairwise2')
+        self.matrix = Bio.Align.substitution_matrices.load('BLOSUM62')
+
+    def pairwise2_mapping(self, seqA, seqB):
+        """ Residue mapping of the first alignment of Bio.pairwise2, as align_sequences computed it before """
+        aligned_A, aligned_B, _, _, _ = self.pairwise2.align.globalds(
+            ''.join(letter for _, letter in seqA), ''.join(letter for _, letter in seqB),
+            self.matrix, -10.0, -0.5, penalize_end_gaps=(False, False))[0]
+        mapping = {}
+        i_A, i_B = 0, 0
+        for aa_A, aa_B in zip(aligned_A, aligned_B):
+            if aa_A != '-' and aa_B != '-':
+                mapping[seqA[i_A][0]] = seqB[i_B][0]
+            i_A += aa_A != '-'
+            i_B += aa_B != '-'
+        return mapping
+
+    def test_align_sequences_pairwise2(self):
+        # cluster members alike pairs: a few substitutions and truncated ends, also with another numbering
+        rng = np.random.default_rng(0)
+        letters = list('ACDEFGHIKLMNPQRSTVWY')
+        for _ in range(40):
+            sequence = rng.choice(letters, rng.integers(40, 250))
+            member = sequence.copy()
+            substitutions = rng.choice(len(member), len(member) // 20, replace=False)
+            member[substitutions] = rng.choice(letters, len(substitutions))
+            member = member[rng.integers(0, 12):len(member) - rng.integers(0, 12)]
+            seqA = list(enumerate(sequence, start=1))
+            seqB = list(enumerate(member, start=int(rng.integers(1, 100))))
+            _, mapping = align_sequences(seqA, seqB)
+            assert mapping == self.pairwise2_mapping(seqA, seqB)
@@ -1,4 +1,4 @@
-from . import bindingsite, box, box_residues, extract_model_pdbqt
+from . import bindingsite, box, box_batch, box_residues, extract_model_pdbqt
 
 name = "utils"
-__all__ = ["bindingsite", "box", "box_residues", "extract_model_pdbqt"]
+__all__ = ["bindingsite", "box", "box_batch", "box_residues", "extract_model_pdbqt"]
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 
 """Module containing the BindingSite class and the command line interface."""
+import functools
+import json
 import re
 import warnings
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
 from pathlib import PurePath
 from typing import Optional
+import numpy as np
 from Bio import BiopythonDeprecationWarning
 from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
@@ -15,9 +21,13 @@ from biobb_vs.utils.common import (
     calculate_alignment_identity,
     check_input_path,
     check_output_path,
-    get_ligand_residues,
+    get_het_group_index,
+    get_ligand_resnames,
     get_pdb_sequence,
-    get_residue_by_id,
+    get_residue_index,
+    load_cluster_member,
+    search_neighbor_pairs,
+    superimpose_coordinates,
 )
 
 with warnings.catch_warnings():
@@ -26,7 +36,6 @@ with warnings.catch_warnings():
     #    import Bio.SubsMat.MatrixInfo
     # except ImportError:
     import Bio.Align.substitution_matrices
-    import Bio.pairwise2
     import Bio.PDB
 
 
@@ -37,16 +46,22 @@ class BindingSite(BiobbObject):
     | Finds the binding site of the input_pdb_path file based on the ligands' location of similar structures (members of the sequence identity cluster)
 
     Args:
-        input_pdb_path (str): Path to the PDB structure where the binding site is to be found. File type: input. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/data/utils/bindingsite.pdb>`_. Accepted formats: pdb (edam:format_1476).
+        input_pdb_path (str): Path to the PDB structure where the binding site is to be found, or to a zip file with one PDB structure per target. File type: input. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/data/utils/bindingsite.pdb>`_. Accepted formats: pdb (edam:format_1476), zip (edam:format_3987).
         input_clusters_zip (str): Path to the ZIP file with all the PDB members of the identity cluster. File type: input. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/data/utils/bindingsite.zip>`_. Accepted formats: zip (edam:format_3987).
-        output_pdb_path (str): Path to the PDB containig the residues belonging to the binding site. File type: output. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/reference/utils/ref_output_bindingsite.pdb>`_. Accepted formats: pdb (edam:format_1476).
+        output_pdb_path (str): Path to the PDB containig the residues belonging to the binding site, or to a zip file with one PDB per target, named after its structure path within the input zip file (and chain with all_chains), mandatory if there is more than one target. File type: output. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/reference/utils/ref_output_bindingsite.pdb>`_. Accepted formats: pdb (edam:format_1476), zip (edam:format_3987).
+        output_occupancy_path (str) (Optional): Path to the JSON file with the number of superimposed ligands, the contact frequency of every binding site residue (the fraction of the superimposed ligands it is in contact with) and the binding site centroid weighted by the contact frequencies, by target. File type: output. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/reference/utils/ref_output_bindingsite_occupancy.json>`_. Accepted formats: json (edam:format_3464).
         properties (dic - Python dictionary object containing the tool parameters, not input/output files):
             * **ligand** (*str*) - (None) Ligand to be found in the protein structure. If no ligand provided, the largest one will be selected, if more than one.
             * **radius** (*float*) - (5.0) [0.1~1000|0.1] Cut-off distance (Ångstroms) around ligand atoms to consider a protein atom as a binding site atom.
+            * **min_frequency** (*float*) - (0.0) [0~1|0.05] Minimum contact frequency, the fraction of the superimposed ligands a residue is in contact with, for a residue to belong to the binding site.
             * **max_num_ligands** (*int*) - (15) [0~1000|1] Total number of superimposed ligands to be extracted from the identity cluster. For populated clusters, the restriction avoids to superimpose redundant structures. If 0, all ligands extracted will be considered.
             * **matrix_name** (*str*) - ("BLOSUM62") Substitution matrices for use in alignments. Values: BENNER22, BENNER6, BENNER74, BLASTN, BLASTP, BLOSUM45, BLOSUM50, BLOSUM62, BLOSUM80, BLOSUM90, DAYHOFF, FENG, GENETIC, GONNET1992, HOXD70, JOHNSON, JONES, LEVIN, MCLACHLAN, MDM78, MEGABLAST, NUC.4.4, PAM250, PAM30, PAM70, RAO, RISLER, SCHNEIDER, STR, TRANS.
             * **gap_open** (*float*) - (-10.0) [-1000~1000|0.1] Gap open penalty.
             * **gap_extend** (*float*) - (-0.5) [-1000~1000|0.1] Gap extend penalty.
+            * **all_chains** (*bool*) - (False) Find the binding site of every chain of the input structures. If False, only the last chain of each input structure is used.
+            * **het_groups_path** (*str*) - (None) Path to a CSV file with a het group code and its class (water, ion, modres or ligand) per row, ie: derived from the Chemical Component Dictionary. It extends or replaces the built-in classification used to discard waters, ions and modified residues when looking for ligands.
+            * **cache_path** (*str*) - (None) Path to a folder where the parsed cluster members are stored by file content and the sequence alignments by sequences, matrix_name and gap penalties. Cluster members already parsed or with an already aligned sequence reuse the stored data, also in later runs.
+            * **num_workers** (*int*) - (1) [1~1000|1] Number of processes used to parse, screen and align the cluster members against the targets in parallel. The accepted members are superimposed all at once afterwards.
             * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
             * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
             * **sandbox_path** (*str*) - ("./") [WF property] Parent path to the sandbox directory.
@@ -66,6 +81,7 @@ class BindingSite(BiobbObject):
             bindingsite(input_pdb_path='/path/to/myStructure.pdb',
                         input_clusters_zip='/path/to/myCluster.zip',
                         output_pdb_path='/path/to/newStructure.pdb',
+                        output_occupancy_path='/path/to/newOccupancy.json',
                         properties=prop)
 
     Info:
@@ -84,6 +100,7 @@ class BindingSite(BiobbObject):
         input_pdb_path,
         input_clusters_zip,
         output_pdb_path,
+        output_occupancy_path=None,
         properties=None,
         **kwargs,
     ) -> None:
@@ -99,16 +116,21 @@ class BindingSite(BiobbObject):
                 "input_pdb_path": input_pdb_path,
                 "input_clusters_zip": input_clusters_zip,
             },
-            "out": {"output_pdb_path": output_pdb_path},
+            "out": {"output_pdb_path": output_pdb_path, "output_occupancy_path": output_occupancy_path},
         }
 
         # Properties specific for BB
         self.ligand = properties.get("ligand", None)
         self.radius = float(properties.get("radius", 5.0))
+        self.min_frequency = float(properties.get("min_frequency", 0.0))
         self.max_num_ligands = properties.get("max_num_ligands", 15)
         self.matrix_name = properties.get("matrix_name", "BLOSUM62")
         self.gap_open = properties.get("gap_open", -10.0)
         self.gap_extend = properties.get("gap_extend", -0.5)
+        self.all_chains = properties.get("all_chains", False)
+        self.het_groups_path = properties.get("het_groups_path", None)
+        self.cache_path = properties.get("cache_path", None)
+        self.num_workers = int(properties.get("num_workers", 1))
         self.properties = properties
 
         # Check the properties
@@ -122,6 +144,7 @@ class BindingSite(BiobbObject):
             "input_pdb_path",
             self.out_log,
             self.__class__.__name__,
+            ["pdb", "zip"],
         )
         self.io_dict["in"]["input_clusters_zip"] = check_input_path(
             self.io_dict["in"]["input_clusters_zip"],
@@ -135,305 +158,411 @@ class BindingSite(BiobbObject):
             False,
             self.out_log,
             self.__class__.__name__,
+            ["pdb", "zip"],
+        )
+        self.io_dict["out"]["output_occupancy_path"] = check_output_path(
+            self.io_dict["out"]["output_occupancy_path"],
+            "output_occupancy_path",
+            True,
+            self.out_log,
+            self.__class__.__name__,
         )
 
-    @launchlogger
-    def launch(self) -> int:
-        """Execute the :class:`BindingSite <utils.bindingsite.BindingSite>` utils.bindingsite.BindingSite object."""
-
-        # check input/output paths and parameters
-        self.check_data_params(self.out_log, self.err_log)
-
-        # Setup Biobb
-        if self.check_restart():
-            return 0
-        self.stage_files()
-
-        # Parse structure
+    def load_structures(self):
+        """Yields the name and the parsed structure of the input PDB structure or of every structure in the input zip file"""
         fu.log(
             "Loading input PDB structure %s" % (self.io_dict["in"]["input_pdb_path"]),
             self.out_log,
             self.global_log,
         )
-        structure_name = PurePath(self.io_dict["in"]["input_pdb_path"]).name
         parser = Bio.PDB.PDBParser(QUIET=True)
-        structPDB = parser.get_structure(
-            structure_name, self.io_dict["in"]["input_pdb_path"]
-        )
+        if PurePath(self.io_dict["in"]["input_pdb_path"]).suffix != ".zip":
+            structure_name = PurePath(self.io_dict["in"]["input_pdb_path"]).name
+            yield structure_name, parser.get_structure(
+                structure_name, self.io_dict["in"]["input_pdb_path"]
+            )
+            return
 
-        if len(structPDB):
-            structPDB = structPDB[0]
+        with zipfile.ZipFile(self.io_dict["in"]["input_pdb_path"], "r") as zip_f:
+            for info in zip_f.infolist():
+                if info.is_dir():
+                    continue
+                # named after the path within the zip file, so structures with the same name in different folders do not clash
+                structure_name = info.filename
+                yield structure_name, parser.get_structure(
+                    structure_name, StringIO(zip_f.read(info).decode("utf-8"))
+                )
 
-        # Use only one chain
-        n_chains = structPDB.get_list()
-        if len(n_chains) != 1:
-            fu.log(
-                "More than one chain found in the input PDB structure. Using only the first chain to find the binding site",
-                self.out_log,
-                self.global_log,
+    def superimpose_ligands(self, members_coords):
+        """Superimposes all the accepted members against a target at once from their matched CA coordinates, transforming only their ligand coordinates"""
+        fu.log(
+            "Superimposing %s cluster members" % len(members_coords),
+            self.out_log,
+        )
+        rot, tran, rms = superimpose_coordinates(
+            [coords[0] for coords in members_coords],
+            [coords[1] for coords in members_coords],
+        )
+        ligands_aligned = []
+        for i, (_, _, ligand_coords) in enumerate(members_coords):
+            fu.log("RMSD (member #%s): %s" % (i + 1, rms[i]), self.out_log)
+            # as Bio.PDB.Superimposer would do on the ligand atoms
+            ligands_aligned.append(
+                np.dot(ligand_coords, rot[i].astype("f")) + tran[i].astype("f")
             )
-            # get first chain in case there is more than one chain
-            for struct_chain in structPDB.get_chains():
-                structPDB = struct_chain
 
-        # Get AA sequence
-        structPDB_seq = get_pdb_sequence(structPDB)
-        if len(structPDB_seq) == 0:
-            fu.log(
-                self.__class__.__name__ + ": Cannot extract AA sequence from the input PDB structure %s. Wrong format?"
-                % self.io_dict["in"]["input_pdb_path"],
-                self.out_log,
-            )
-            raise SystemExit(
-                self.__class__.__name__ + ": Cannot extract AA sequence from the input PDB structure %s. Wrong format?"
-                % self.io_dict["in"]["input_pdb_path"]
+        fu.log(
+            "All transformed ligand coordinates saved, getting binding site residues",
+            self.out_log,
+        )
+        return ligands_aligned
+
+    def get_binding_site_residues(self, structPDB, ligands_aligned):
+        """Returns the contact frequency by id of the structPDB residues with an atom within radius of the superimposed ligands,
+        the fraction of the superimposed ligands they are in contact with, if not lower than min_frequency"""
+
+        # Select binding site atoms as those around cluster superimposed ligands
+
+        fu.log(
+            "Defining binding site residues as those %sÅ around the %s cluster superimposed ligands"
+            % (self.radius, len(ligands_aligned)),
+            self.out_log,
+        )
+
+        # select Residues and Atoms from input PDB structure
+        structPDB_residues = [res for res in structPDB.get_residues()]
+        structPDB_atoms = [atom for atom in structPDB.get_atoms()]
+
+        # compute neighbors for aligned ligands in the input PDB structure,
+        # looking for PDB atoms 5A around all the ligand atoms at once
+        structPDB_bs_frequency = {}
+        if ligands_aligned:
+            atom_indices, ligand_atom_indices = search_neighbor_pairs(
+                [atom.get_coord() for atom in structPDB_atoms],
+                np.concatenate(ligands_aligned),
+                self.radius,
             )
-        else:
+            residue_of_atom = np.repeat(np.arange(len(structPDB_residues)), [len(res) for res in structPDB_residues])
+            ligand_of_atom = np.repeat(np.arange(len(ligands_aligned)), [len(coords) for coords in ligands_aligned])
+            # count every ligand once per residue
+            contacts = np.unique(residue_of_atom[atom_indices] * len(ligands_aligned) + ligand_of_atom[ligand_atom_indices])
+            frequency = np.bincount(contacts // len(ligands_aligned), minlength=len(structPDB_residues)) / len(ligands_aligned)
+            for i in np.flatnonzero((frequency > 0) & (frequency >= self.min_frequency)):
+                structPDB_bs_frequency[structPDB_residues[i].get_id()] = float(frequency[i])
+
+        if self.min_frequency:
             fu.log(
-                "Found %s residues in %s"
-                % (len(structPDB_seq), self.io_dict["in"]["input_pdb_path"]),
+                "Found %s residues in contact with at least %s of the superimposed ligands"
+                % (len(structPDB_bs_frequency), self.min_frequency),
                 self.out_log,
             )
 
-        # create temporary folder for decompressing the input_clusters_zip file
-        unique_dir = PurePath(fu.create_unique_dir())
-        fu.log(
-            "Creating %s temporary folder" % unique_dir, self.out_log, self.global_log
-        )
+        return structPDB_bs_frequency
 
-        # decompress the input_clusters_zip file
-        cluster_list = fu.unzip_list(
-            zip_file=self.io_dict["in"]["input_clusters_zip"],
-            dest_dir=str(unique_dir),
-            out_log=self.out_log,
-        )
+    def save_binding_site(self, structPDB, structPDB_bs_residues_raw, output):
+        """Writes the binding site residues of structPDB, without het groups, into the output path or file object and returns them"""
 
-        clusterPDB_ligands_aligned = []
-        clusterPDB_ligands_num = 0
+        io = Bio.PDB.PDBIO()
 
-        fu.log("Iterating on all clusters:", self.out_log)
+        # unselect input PDB atoms not in binding site
+        structPDB_bs_residues = []
+        p = re.compile("H_|W_|W")
+        residues_to_remove = []
+        for res in structPDB.get_residues():
+            if res.id not in structPDB_bs_residues_raw.keys():
+                # add residue to residues_to_remove list
+                residues_to_remove.append(res)
+            elif p.match(res.resname):
+                # add residue to residues_to_remove list
+                residues_to_remove.append(res)
+            else:
+                # this residue will be preserved
+                structPDB_bs_residues.append(res)
 
-        for idx, cluster_path in enumerate(cluster_list):
-            cluster_name = PurePath(cluster_path).stem
-            fu.log(" ", self.out_log)
-            fu.log(
-                "------------ Iteration #%s --------------" % (idx + 1), self.out_log
-            )
-            fu.log("Cluster member: %s" % cluster_name, self.out_log)
+        # unselect input PDB atoms not in binding site
+        for res in residues_to_remove:
+            res.get_parent().detach_child(res.id)
 
-            # Load and Parse PDB
-            clusterPDB = {}
-            clusterPDB = parser.get_structure(cluster_name, cluster_path)[0]
+        # write PDB file
+        io.set_structure(structPDB)
+        io.save(output)
+
+        return structPDB_bs_residues
+
+    def get_occupancy(self, structPDB_bs_residues, structPDB_bs_frequency, ligands_num):
+        """Returns the contact frequency of every binding site residue and the binding site centroid,
+        the mean of the residues centres weighted by their contact frequency"""
+
+        centroid = None
+        if structPDB_bs_residues:
+            atoms_num = np.array([len(res) for res in structPDB_bs_residues])
+            coords = np.array([atom.get_coord() for res in structPDB_bs_residues for atom in res], dtype=np.float64)
+            centres = np.add.reduceat(coords, np.concatenate(([0], np.cumsum(atoms_num)[:-1]))) / atoms_num[:, np.newaxis]
+            weights = np.array([structPDB_bs_frequency[res.get_id()] for res in structPDB_bs_residues])
+            centroid = np.round(np.dot(weights, centres) / weights.sum(), 3).tolist()
+
+        return {
+            "num_ligands": ligands_num,
+            "centroid": centroid,
+            "residues": [
+                {
+                    "chain": res.get_parent().get_id(),
+                    "resname": res.get_resname(),
+                    "resnum": res.get_id()[1],
+                    "frequency": round(structPDB_bs_frequency[res.get_id()], 3),
+                }
+                for res in structPDB_bs_residues
+            ],
+        }
 
-            # Use only the first chain
-            for cluster_chain in clusterPDB.get_chains():  # type: ignore
-                clusterPDB = cluster_chain
+    @launchlogger
+    def launch(self) -> int:
+        """Execute the :class:`BindingSite <utils.bindingsite.BindingSite>` utils.bindingsite.BindingSite object."""
 
-            # Looking for ligands
-            clusterPDB_ligands = get_ligand_residues(clusterPDB)
-            if (len(clusterPDB_ligands)) == 0:
-                fu.log(
-                    "No ligands found that could guide the binding site search. Ignoring this member: %s"
-                    % cluster_name,
-                    self.out_log,
-                )
-                continue
+        # check input/output paths and parameters
+        self.check_data_params(self.out_log, self.err_log)
 
-            # Selecting the largest ligand, if more than one
-            lig_atoms_num = 0
-            clusterPDB_ligand = {}
-            if self.ligand:
-                if self.ligand in [x.get_resname() for x in clusterPDB_ligands]:
-                    for lig in clusterPDB_ligands:
-                        if lig.get_resname() == self.ligand:
-                            clusterPDB_ligand = lig
-                            lig_atoms_num = len(lig.get_list())
-                            fu.log(
-                                "Ligand found: %s  (%s atoms)"
-                                % (lig.get_resname(), lig_atoms_num),
-                                self.out_log,
-                            )
-                else:
+        # Setup Biobb
+        if self.check_restart():
+            return 0
+        self.stage_files()
+
+        # Parse structures, one binding site is found for each target: the input PDB structure or
+        # every structure of the input zip file, or every chain of them with all_chains
+        targets = []
+        for structure_name, structPDB in self.load_structures():
+            if len(structPDB):
+                structPDB = structPDB[0]
+
+            if self.all_chains:
+                structPDB_chains = [
+                    ("%s chain %s" % (structure_name, chain.get_id()), "%s_%s" % (PurePath(structure_name).with_suffix("").as_posix(), chain.get_id()), chain)
+                    for chain in structPDB.get_chains()
+                ]
+            else:
+                # Use only one chain
+                n_chains = structPDB.get_list()
+                if len(n_chains) != 1:
                     fu.log(
-                        "Ligand %s not found in %s cluster member, skipping this cluster"
-                        % (self.ligand, cluster_name),
+                        "More than one chain found in the input PDB structure %s. Using only the last chain to find the binding site, set all_chains to find the binding site of every chain"
+                        % structure_name,
                         self.out_log,
+                        self.global_log,
+                    )
+                    # get last chain in case there is more than one chain
+                    for struct_chain in structPDB.get_chains():
+                        structPDB = struct_chain
+                structPDB_chains = [(structure_name, PurePath(structure_name).with_suffix("").as_posix(), structPDB)]
+
+            for target_name, output_name, structPDB in structPDB_chains:
+                # Get AA sequence
+                structPDB_seq = get_pdb_sequence(structPDB)
+                if len(structPDB_seq) == 0:
+                    if self.all_chains:
+                        fu.log("No AA sequence found in %s, skipping it" % target_name, self.out_log)
+                        continue
+                    fu.log(
+                        self.__class__.__name__ + ": Cannot extract AA sequence from the input PDB structure %s. Wrong format?"
+                        % target_name,
+                        self.out_log,
+                    )
+                    raise SystemExit(
+                        self.__class__.__name__ + ": Cannot extract AA sequence from the input PDB structure %s. Wrong format?"
+                        % target_name
                     )
-                    continue
-            else:
-                if len(clusterPDB_ligands) > 1:
-                    for lig_res in clusterPDB_ligands:
-                        lig_res_atoms_num = len(lig_res.get_list())
-                        fu.log(
-                            "Ligand found: %s  (%s atoms)"
-                            % (lig_res.get_resname(), lig_res_atoms_num),
-                            self.out_log,
-                        )
-                        if lig_res_atoms_num > lig_atoms_num:
-                            clusterPDB_ligand = lig_res
-                            lig_atoms_num = lig_res_atoms_num
                 else:
-                    clusterPDB_ligand = clusterPDB_ligands[0]
-                    lig_atoms_num = len(clusterPDB_ligands[0].get_list())
+                    fu.log(
+                        "Found %s residues in %s"
+                        % (len(structPDB_seq), target_name),
+                        self.out_log,
+                    )
+
+                # CA atoms of the target by residue number, to superimpose the cluster members
+                structPDB_ca = {
+                    res_num: (res.get_resname(), res["CA"].get_coord() if "CA" in res else None)
+                    for res_num, res in get_residue_index(structPDB).items()
+                }
+                targets.append((target_name, output_name, structPDB, structPDB_seq, structPDB_ca))
 
+        if not targets:
             fu.log(
-                "Member accepted. Valid ligand found: %s (%s atoms)"
-                % (clusterPDB_ligand.get_resname(), lig_atoms_num),  # type: ignore
+                self.__class__.__name__ + ": Cannot extract AA sequence from the input PDB structure %s. Wrong format?"
+                % self.io_dict["in"]["input_pdb_path"],
                 self.out_log,
             )
-
-            # Mapping residues by sequence alignment to match structPDB-clusterPDB paired residues
-
-            # Get AA sequence
-            clusterPDB_seq = get_pdb_sequence(clusterPDB)
-
-            # Pairwise align
-            aln, residue_map = align_sequences(
-                structPDB_seq,
-                clusterPDB_seq,
-                self.matrix_name,
-                self.gap_open,
-                self.gap_extend,
+            raise SystemExit(
+                self.__class__.__name__ + ": Cannot extract AA sequence from the input PDB structure %s. Wrong format?"
+                % self.io_dict["in"]["input_pdb_path"]
             )
+        output_names = [output_name for _, output_name, _, _, _ in targets]
+        duplicated = sorted({output_name for output_name in output_names if output_names.count(output_name) > 1})
+        if duplicated:
             fu.log(
-                "Matching residues to input PDB structure. Alignment is:\n%s"
-                % (aln[1]),
+                self.__class__.__name__ + ": More than one binding site would be saved as %s, rename the input structures"
+                % ", ".join(duplicated),
                 self.out_log,
             )
-
-            # Calculate (gapless) sequence identity
-            seq_identity, gap_seq_identity = calculate_alignment_identity(
-                aln[0], aln[1]
+            raise SystemExit(
+                self.__class__.__name__ + ": More than one binding site would be saved as %s, rename the input structures"
+                % ", ".join(duplicated)
+            )
+        if len(targets) > 1 and PurePath(self.io_dict["out"]["output_pdb_path"]).suffix != ".zip":
+            fu.log(
+                self.__class__.__name__ + ": %s binding sites to be found, output_pdb_path must be a zip file"
+                % len(targets),
+                self.out_log,
+            )
+            raise SystemExit(
+                self.__class__.__name__ + ": %s binding sites to be found, output_pdb_path must be a zip file"
+                % len(targets)
             )
-            fu.log("Sequence identity (%%): %s" % (seq_identity), self.out_log)
-            fu.log("Gap less identity (%%): %s" % (gap_seq_identity), self.out_log)
-
-            # Selecting aligned CA atoms from first model, first chain
-
-            struct_atoms = []
-            cluster_atoms = []
-
-            for struct_res in residue_map:
-                try:
-                    cluster_atoms.append(clusterPDB[residue_map[struct_res]]["CA"])
-                    struct_atoms.append(get_residue_by_id(structPDB, struct_res)["CA"])
-                except KeyError:
-                    fu.log(
-                        "Cannot find CA atom for residue %s  (input PDB  %s)"
-                        % (
-                            get_residue_by_id(structPDB, struct_res).get_resname(),
-                            struct_res,
-                        ),
-                        self.out_log,
-                    )
-                    pass
 
-            if len(cluster_atoms) == 0:
+        # het groups classification
+        if self.het_groups_path:
+            try:
+                het_groups = get_het_group_index(self.het_groups_path)
+            except (OSError, ValueError) as e:
                 fu.log(
-                    self.__class__.__name__ + ": Cannot find CA atoms (1st model, 1st chain) in cluster member %s when aligning against %s. Ignoring this member."
-                    % (cluster_name, structure_name),
+                    self.__class__.__name__ + ": Cannot read het_groups_path %s: %s"
+                    % (self.het_groups_path, e),
                     self.out_log,
                 )
                 raise SystemExit(
-                    self.__class__.__name__ + ": Cannot find CA atoms (1st model, 1st chain) in cluster member %s when aligning against %s. Ignoring this member."
-                    % (cluster_name, structure_name)
-                )
-            else:
-                fu.log(
-                    "Superimposing %s aligned protein residues" % (len(cluster_atoms)),
-                    self.out_log,
+                    self.__class__.__name__ + ": Cannot read het_groups_path %s: %s"
+                    % (self.het_groups_path, e)
                 )
+            fu.log(
+                "Classifying het groups with %s codes" % len(het_groups),
+                self.out_log,
+            )
 
-            # Align against input structure
-
-            si = Bio.PDB.Superimposer()
-            si.set_atoms(struct_atoms, cluster_atoms)
-            si.apply(clusterPDB.get_atoms())  # type: ignore
-            fu.log("RMSD: %s" % (si.rms), self.out_log)
+        # list the members of the input_clusters_zip file, they are parsed straight from the zip file when needed
+        with zipfile.ZipFile(self.io_dict["in"]["input_clusters_zip"], "r") as zip_f:
+            cluster_list = [info.filename for info in zip_f.infolist() if not info.is_dir()]
+        fu.log(
+            "Found %s cluster members in %s"
+            % (len(cluster_list), self.io_dict["in"]["input_clusters_zip"]),
+            self.out_log,
+        )
 
-            # Save transformed structure (and ligand)
-            clusterPDB_ligand_aligned = clusterPDB[clusterPDB_ligand.get_id()]  # type: ignore
-            fu.log("Saving transformed ligand coordinates", self.out_log)
+        clusterPDB_members_coords = []
+        clusterPDB_ligands_num = 0
 
-            clusterPDB_ligands_aligned.append(clusterPDB_ligand_aligned)
+        fu.log("Iterating on all clusters:", self.out_log)
 
-            #  Stop after n accepted cluster members
+        process_member = functools.partial(
+            process_cluster_member,
+            clusters_zip=self.io_dict["in"]["input_clusters_zip"],
+            targets=[(target_name, structPDB_seq, structPDB_ca) for target_name, _, _, structPDB_seq, structPDB_ca in targets],
+            ligand=self.ligand,
+            matrix_name=self.matrix_name,
+            gap_open=self.gap_open,
+            gap_extend=self.gap_extend,
+            cache_path=self.cache_path,
+            het_groups_path=self.het_groups_path,
+        )
 
-            clusterPDB_ligands_num += 1
+        # members are processed ahead in parallel but accepted in the cluster order,
+        # so the max_num_ligands cut-off selects the same ligands whatever the number of workers
+        executor = None
+        if self.num_workers > 1:
+            fu.log(
+                "Processing cluster members with %s workers" % self.num_workers,
+                self.out_log,
+            )
+            executor = ProcessPoolExecutor(max_workers=self.num_workers)
+            results = executor.map(process_member, cluster_list)
+        else:
+            # a single worker reads all the members from the same open zip file
+            clusters_zip = zipfile.ZipFile(self.io_dict["in"]["input_clusters_zip"], "r")
+            results = (process_member(cluster_member, clusters_zip=clusters_zip) for cluster_member in cluster_list)
+
+        try:
+            for idx, (cluster_member, (messages, member_coords, error)) in enumerate(
+                zip(cluster_list, results)
+            ):
+                cluster_name = PurePath(cluster_member).stem
+                fu.log(" ", self.out_log)
+                fu.log(
+                    "------------ Iteration #%s --------------" % (idx + 1), self.out_log
+                )
+                fu.log("Cluster member: %s" % cluster_name, self.out_log)
 
-            if clusterPDB_ligands_num > self.max_num_ligands:
-                break
+                for message in messages:
+                    fu.log(message, self.out_log)
 
-        fu.log(" ", self.out_log)
-        fu.log("----------------------------------------", self.out_log)
-        fu.log(
-            "All transformed ligand coordinates saved, getting binding site residues",
-            self.out_log,
-        )
+                if error:
+                    fu.log(self.__class__.__name__ + ": " + error, self.out_log)
+                    raise SystemExit(self.__class__.__name__ + ": " + error)
 
-        # Select binding site atoms as those around cluster superimposed ligands
+                if member_coords is None:
+                    continue
 
-        fu.log(
-            "Defining binding site residues as those %sÅ around the %s cluster superimposed ligands"
-            % (self.radius, clusterPDB_ligands_num),
-            self.out_log,
-        )
+                fu.log("Saving ligand coordinates", self.out_log)
 
-        # select Atoms from aligned ligands
-        clusterPDB_ligands_aligned2 = [res for res in clusterPDB_ligands_aligned]
-        clusterPDB_ligands_aligned_atoms = Bio.PDB.Selection.unfold_entities(
-            clusterPDB_ligands_aligned2, "A"
-        )
+                clusterPDB_members_coords.append(member_coords)
 
-        # select Atoms from input PDB structure
-        structPDB_atoms = [atom for atom in structPDB.get_atoms()]
+                #  Stop after n accepted cluster members
 
-        # compute neighbors for aligned ligands in the input PDB structure
-        structPDB_bs_residues_raw = {}
-        structPDB_neighbors = Bio.PDB.NeighborSearch(structPDB_atoms)
-        for ligand_atom in clusterPDB_ligands_aligned_atoms:
-            # look for PDB atoms 5A around each ligand atom
-            k_l = structPDB_neighbors.search(ligand_atom.coord, self.radius, "R")
-            for k in k_l:
-                structPDB_bs_residues_raw[k.get_id()] = k.get_full_id()
+                clusterPDB_ligands_num += 1
 
-        # Save binding site to PDB
+                if clusterPDB_ligands_num > self.max_num_ligands:
+                    break
+        finally:
+            if executor:
+                # do not wait for the members beyond the cut-off
+                executor.shutdown(cancel_futures=True)
+            else:
+                clusters_zip.close()
 
-        io = Bio.PDB.PDBIO()
-        fu.log(
-            "Writing binding site residues into %s"
-            % (self.io_dict["out"]["output_pdb_path"]),
-            self.out_log,
-        )
+        fu.log(" ", self.out_log)
+        fu.log("----------------------------------------", self.out_log)
 
-        # unselect input PDB atoms not in binding site
-        structPDB_bs_atoms = 0
-        p = re.compile("H_|W_|W")
-        residue_ids_to_remove = []
-        for res in structPDB.get_residues():
-            if res.id not in structPDB_bs_residues_raw.keys():
-                # add residue to residue_ids_to_remove list
-                residue_ids_to_remove.append(res.id)
-            elif p.match(res.resname):
-                # add residue to residue_ids_to_remove list
-                residue_ids_to_remove.append(res.id)
-            else:
-                # this residue will be preserved
-                structPDB_bs_atoms += len(res.get_list())
+        occupancy = {}
+        zip_out = None
+        if PurePath(self.io_dict["out"]["output_pdb_path"]).suffix == ".zip":
+            zip_out = zipfile.ZipFile(self.io_dict["out"]["output_pdb_path"], "w", zipfile.ZIP_DEFLATED)
+        try:
+            for t, (target_name, output_name, structPDB, _, _) in enumerate(targets):
+                if len(targets) > 1:
+                    fu.log("Target: %s" % target_name, self.out_log)
+                clusterPDB_ligands_aligned = self.superimpose_ligands([coords[t] for coords in clusterPDB_members_coords])
+                structPDB_bs_frequency = self.get_binding_site_residues(structPDB, clusterPDB_ligands_aligned)
+
+                # Save binding site to PDB
+                if zip_out:
+                    fu.log(
+                        "Writing binding site residues into %s in %s"
+                        % (output_name + ".pdb", self.io_dict["out"]["output_pdb_path"]),
+                        self.out_log,
+                    )
+                    pdb_out = StringIO()
+                    structPDB_bs_residues = self.save_binding_site(structPDB, structPDB_bs_frequency, pdb_out)
+                    zip_out.writestr(output_name + ".pdb", pdb_out.getvalue())
+                else:
+                    fu.log(
+                        "Writing binding site residues into %s"
+                        % (self.io_dict["out"]["output_pdb_path"]),
+                        self.out_log,
+                    )
+                    structPDB_bs_residues = self.save_binding_site(structPDB, structPDB_bs_frequency, self.io_dict["out"]["output_pdb_path"])
 
-        # unselect input PDB atoms not in binding site
-        for chain in structPDB:
-            for idr in residue_ids_to_remove:
-                chain.detach_child(idr)
+                occupancy[output_name] = self.get_occupancy(structPDB_bs_residues, structPDB_bs_frequency, len(clusterPDB_ligands_aligned))
+        finally:
+            if zip_out:
+                zip_out.close()
 
-        # write PDB file
-        io.set_structure(structPDB)
-        io.save(self.io_dict["out"]["output_pdb_path"])
+        if self.io_dict["out"]["output_occupancy_path"]:
+            fu.log(
+                "Saving binding site occupancy to %s file" % self.io_dict["out"]["output_occupancy_path"],
+                self.out_log,
+            )
+            with open(self.io_dict["out"]["output_occupancy_path"], "w") as outfile:
+                json.dump(occupancy, outfile, indent=4)
 
         # Copy files to host
         self.copy_to_host()
 
-        self.tmp_files.append(str(unique_dir))
         self.remove_tmp_files()
 
         self.check_arguments(output_files_created=True, raise_exception=False)
@@ -441,10 +570,177 @@ class BindingSite(BiobbObject):
         return 0
 
 
+def process_cluster_member(
+    cluster_member,
+    clusters_zip,
+    targets,
+    ligand=None,
+    matrix_name="BLOSUM62",
+    gap_open=-10.0,
+    gap_extend=-0.5,
+    cache_path=None,
+    het_groups_path=None,
+):
+    """Matches the cluster_member of the clusters_zip identity cluster, a zip file path or an open ZipFile, with every target, a (name, sequence, CA atoms by residue number) tuple, by sequence alignment.
+    Returns the log messages, the coordinates of the matched CA atoms of each target and the cluster member and of the ligand
+    (None if the member is ignored) and an error message, if any."""
+
+    messages = []
+    cluster_name = PurePath(cluster_member).stem
+
+    if isinstance(clusters_zip, zipfile.ZipFile):
+        cluster_data = clusters_zip.read(cluster_member)
+    else:
+        with zipfile.ZipFile(clusters_zip, "r") as zip_f:
+            cluster_data = zip_f.read(cluster_member)
+
+    het_groups = get_het_group_index(het_groups_path)
+
+    # Discard members without candidate ligands before parsing them
+    ligand_resnames = get_ligand_resnames(cluster_data, het_groups)
+    if not ligand_resnames:
+        messages.append(
+            "No ligands found that could guide the binding site search. Ignoring this member: %s"
+            % cluster_name
+        )
+        return messages, None, None
+    if ligand and ligand not in ligand_resnames:
+        messages.append(
+            "Ligand %s not found in %s cluster member, skipping this cluster"
+            % (ligand, cluster_name)
+        )
+        return messages, None, None
+
+    # Load and Parse PDB, or map it from the cache if already parsed by a previous run
+    clusterPDB = load_cluster_member(cluster_data, cluster_name, cache_path)
+
+    # Looking for ligands, as get_ligand_residues does, in the chain used to superimpose the member
+    het_offsets = np.concatenate(([0], np.cumsum(clusterPDB["het_atoms"])))
+    clusterPDB_ligands = [
+        i
+        for i, resname in enumerate(clusterPDB["het_resnames"])
+        if not clusterPDB["het_waters"][i] and het_groups.is_ligand(resname)
+    ]
+    if (len(clusterPDB_ligands)) == 0:
+        messages.append(
+            "No ligands found that could guide the binding site search. Ignoring this member: %s"
+            % cluster_name
+        )
+        return messages, None, None
+
+    # Selecting the largest ligand, if more than one
+    lig_atoms_num = 0
+    clusterPDB_ligand = -1
+    if ligand:
+        if ligand in [clusterPDB["het_resnames"][x] for x in clusterPDB_ligands]:
+            for lig in clusterPDB_ligands:
+                if clusterPDB["het_resnames"][lig] == ligand:
+                    clusterPDB_ligand = lig
+                    lig_atoms_num = int(clusterPDB["het_atoms"][lig])
+                    messages.append(
+                        "Ligand found: %s  (%s atoms)"
+                        % (clusterPDB["het_resnames"][lig], lig_atoms_num)
+                    )
+        else:
+            messages.append(
+                "Ligand %s not found in %s cluster member, skipping this cluster"
+                % (ligand, cluster_name)
+            )
+            return messages, None, None
+    else:
+        if len(clusterPDB_ligands) > 1:
+            for lig_res in clusterPDB_ligands:
+                lig_res_atoms_num = int(clusterPDB["het_atoms"][lig_res])
+                messages.append(
+                    "Ligand found: %s  (%s atoms)"
+                    % (clusterPDB["het_resnames"][lig_res], lig_res_atoms_num)
+                )
+                if lig_res_atoms_num > lig_atoms_num:
+                    clusterPDB_ligand = lig_res
+                    lig_atoms_num = lig_res_atoms_num
+        else:
+            clusterPDB_ligand = clusterPDB_ligands[0]
+            lig_atoms_num = int(clusterPDB["het_atoms"][clusterPDB_ligands[0]])
+
+    messages.append(
+        "Member accepted. Valid ligand found: %s (%s atoms)"
+        % (clusterPDB["het_resnames"][clusterPDB_ligand], lig_atoms_num)
+    )
+
+    # Superimposed later on, along with the rest of accepted members
+    ligand_coords = np.array(
+        clusterPDB["het_coords"][het_offsets[clusterPDB_ligand]:het_offsets[clusterPDB_ligand + 1]]
+    )
+
+    # Mapping residues by sequence alignment to match structPDB-clusterPDB paired residues, the parsed member is shared by all the targets
+
+    # Get AA sequence
+    clusterPDB_seq = list(zip(clusterPDB["seq_resnums"].tolist(), clusterPDB["seq_letters"].tolist()))
+    clusterPDB_index = {res_num: i for i, res_num in enumerate(clusterPDB["res_nums"].tolist())}
+
+    members_coords = []
+    for structure_name, structPDB_seq, structPDB_ca in targets:
+        if len(targets) > 1:
+            messages.append("Target: %s" % structure_name)
+
+        # Pairwise align
+        aln, residue_map = align_sequences(
+            structPDB_seq,
+            clusterPDB_seq,
+            matrix_name,
+            gap_open,
+            gap_extend,
+            cache_path,
+        )
+        messages.append(
+            "Matching residues to input PDB structure. Alignment is:\n%s" % (aln[1])
+        )
+
+        # Calculate (gapless) sequence identity
+        seq_identity, gap_seq_identity = calculate_alignment_identity(aln[0], aln[1])
+        messages.append("Sequence identity (%%): %s" % (seq_identity))
+        messages.append("Gap less identity (%%): %s" % (gap_seq_identity))
+
+        # Selecting aligned CA atoms from first model, first chain
+
+        struct_coords = []
+        cluster_coords = []
+
+        for struct_res in residue_map:
+            struct_resname, struct_ca = structPDB_ca[struct_res]
+            cluster_res = clusterPDB_index.get(residue_map[struct_res])
+            cluster_ca = clusterPDB["res_ca"][cluster_res] if cluster_res is not None else None
+            if cluster_ca is None or np.isnan(cluster_ca).any() or struct_ca is None:
+                messages.append(
+                    "Cannot find CA atom for residue %s  (input PDB  %s)"
+                    % (struct_resname, struct_res)
+                )
+                continue
+            cluster_coords.append(cluster_ca)
+            struct_coords.append(struct_ca)
+
+        if len(cluster_coords) == 0:
+            return (
+                messages,
+                None,
+                "Cannot find CA atoms (1st model, 1st chain) in cluster member %s when aligning against %s. Ignoring this member."
+                % (cluster_name, structure_name),
+            )
+        else:
+            messages.append(
+                "Superimposing %s aligned protein residues" % (len(cluster_coords))
+            )
+
+        members_coords.append((np.array(struct_coords), np.array(cluster_coords), ligand_coords))
+
+    return messages, members_coords, None
+
+
 def bindingsite(
     input_pdb_path: str,
     input_clusters_zip: str,
     output_pdb_path: str,
+    output_occupancy_path: Optional[str] = None,
     properties: Optional[dict] = None,
     **kwargs,
 ) -> int:
@@ -12,6 +12,7 @@ from biobb_vs.utils.common import (
     check_input_path,
     check_output_path,
     get_box_coordinates,
+    read_coordinates,
 )
 
 
@@ -122,18 +123,10 @@ class Box(BiobbObject):
                 self.global_log,
             )
 
-        # get input_pdb_path atoms coordinates
-        selection_atoms_num = 0
-        x_coordslist = []
-        y_coordslist = []
-        z_coordslist = []
-        with open(self.io_dict["in"]["input_pdb_path"]) as infile:
-            for line in infile:
-                if line.startswith("HETATM") or line.startswith("ATOM"):
-                    x_coordslist.append(float(line[31:38].strip()))
-                    y_coordslist.append(float(line[39:46].strip()))
-                    z_coordslist.append(float(line[47:54].strip()))
-                    selection_atoms_num = selection_atoms_num + 1
+        # get input_pdb_path atoms coordinates, one row per coordinate axis
+        with open(self.io_dict["in"]["input_pdb_path"], "rb") as infile:
+            selection_coords = read_coordinates(infile.read(), pqr=input_type == "pqr")
+        x_coordslist, y_coordslist, z_coordslist = np.ascontiguousarray(selection_coords.T)
 
         # Compute binding site box size
 
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+
+"""Module containing the BoxBatch class and the command line interface."""
+from pathlib import Path, PurePath
+from typing import Optional
+import csv
+import zipfile
+import numpy as np
+from biobb_common.generic.biobb_object import BiobbObject
+from biobb_common.tools import file_utils as fu
+from biobb_common.tools.file_utils import launchlogger
+
+from biobb_vs.utils.common import (
+    check_input_path,
+    check_output_path,
+    get_box_coordinates,
+    read_coordinates,
+)
+
+
+class BoxBatch(BiobbObject):
+    """
+    | biobb_vs BoxBatch
+    | This class sets the center and the size of a rectangular parallelepiped box around every selection of a set of residues selections or pockets.
+    | Sets the center and the size of a rectangular parallelepiped box around every PDB residues selection or PQR pocket of a given zip file or directory, all of them computed at once.
+
+    Args:
+        input_selections_path (dir): Zip file or directory with the PDB files containing the selections of residues and / or the PQR files containing the pockets, such as the output of the fpocket building block. File type: input. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/data/fpocket/input_pockets.zip>`_. Accepted formats: zip (edam:format_3987), directory (edam:format_1915).
+        output_boxes_path (str): CSV table with the name, number of atoms, center, size and volume of the box of every selection. File type: output. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/reference/utils/ref_output_boxes.csv>`_. Accepted formats: csv (edam:format_3752).
+        output_boxes_zip (str) (Optional): Zip file with one PDB per selection including the annotation of its box center and size as REMARKs, as the ones of the box building block. File type: output. `Sample file <https://github.com/bioexcel/biobb_vs/raw/master/biobb_vs/test/reference/utils/ref_output_boxes.zip>`_. Accepted formats: zip (edam:format_3987).
+        properties (dic - Python dictionary object containing the tool parameters, not input/output files):
+            * **offset** (*float*) - (2.0) [0.1~1000|0.1] Extra distance (Angstroms) between the last residue atom and the box boundary.
+            * **box_coordinates** (*bool*) - (False) Add box coordinates as 8 ATOM records.
+            * **selection_format** (*str*) - (None) Format of the selections taken from input_selections_path, all the PDB and PQR files if None. Values: pdb (residues selections), pqr (pockets).
+            * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
+            * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
+            * **sandbox_path** (*str*) - ("./") [WF property] Parent path to the sandbox directory.
+
+    Examples:
+        This is a use example of how to use the building block from Python::
+
+            from biobb_vs.utils.box_batch import box_batch
+            prop = {
+                'offset': 2,
+                'box_coordinates': True,
+                'selection_format': 'pqr'
+            }
+            box_batch(input_selections_path='/path/to/myPockets.zip',
+                    output_boxes_path='/path/to/newBoxes.csv',
+                    output_boxes_zip='/path/to/newBoxes.zip',
+                    properties=prop)
+
+    Info:
+        * wrapped_software:
+            * name: In house
+            * license: Apache-2.0
+        * ontology:
+            * name: EDAM
+            * schema: http://edamontology.org/EDAM.owl
+
+    """
+
+    def __init__(
+        self,
+        input_selections_path,
+        output_boxes_path,
+        output_boxes_zip=None,
+        properties=None,
+        **kwargs,
+    ) -> None:
+        properties = properties or {}
+
+        # Call parent class constructor
+        super().__init__(properties)
+        self.locals_var_dict = locals().copy()
+
+        # Input/Output files
+        self.io_dict = {
+            "in": {"input_selections_path": input_selections_path},
+            "out": {
+                "output_boxes_path": output_boxes_path,
+                "output_boxes_zip": output_boxes_zip,
+            },
+        }
+
+        # Properties specific for BB
+        self.offset = float(properties.get("offset", 2.0))
+        self.box_coordinates = float(properties.get("box_coordinates", False))
+        self.selection_format = properties.get("selection_format", None)
+        self.properties = properties
+
+        # Check the properties
+        self.check_properties(properties)
+        self.check_arguments()
+
+    def check_data_params(self, out_log, err_log):
+        """Checks all the input/output paths and parameters"""
+        if not Path(self.io_dict["in"]["input_selections_path"]).is_dir():
+            self.io_dict["in"]["input_selections_path"] = check_input_path(
+                self.io_dict["in"]["input_selections_path"],
+                "input_selections_path",
+                self.out_log,
+                self.__class__.__name__,
+            )
+        self.io_dict["out"]["output_boxes_path"] = check_output_path(
+            self.io_dict["out"]["output_boxes_path"],
+            "output_boxes_path",
+            False,
+            self.out_log,
+            self.__class__.__name__,
+        )
+        self.io_dict["out"]["output_boxes_zip"] = check_output_path(
+            self.io_dict["out"]["output_boxes_zip"],
+            "output_boxes_zip",
+            True,
+            self.out_log,
+            self.__class__.__name__,
+        )
+        if self.selection_format not in (None, "pdb", "pqr"):
+            fu.log(
+                self.__class__.__name__ + ": Incorrect selection_format value %s, exiting"
+                % self.selection_format,
+                self.out_log,
+            )
+            raise SystemExit(
+                self.__class__.__name__ + ": Incorrect selection_format value %s"
+                % self.selection_format
+            )
+
+    def read_selections(self):
+        """Returns the names and the coordinates of the selections of the input zip file or directory, sorted by name"""
+        formats = [self.selection_format] if self.selection_format else ["pdb", "pqr"]
+
+        selections = []
+        path = Path(self.io_dict["in"]["input_selections_path"])
+        if path.is_dir():
+            for file_path in sorted(path.rglob("*")):
+                input_type = file_path.suffix.lstrip(".").lower()
+                if file_path.is_file() and input_type in formats:
+                    name = file_path.relative_to(path).with_suffix("").as_posix()
+                    selections.append((name, read_coordinates(file_path.read_bytes(), pqr=input_type == "pqr")))
+        else:
+            with zipfile.ZipFile(path, "r") as zip_f:
+                for info in sorted(zip_f.infolist(), key=lambda info: info.filename):
+                    input_type = PurePath(info.filename).suffix.lstrip(".").lower()
+                    if not info.is_dir() and input_type in formats:
+                        name = str(PurePath(info.filename).with_suffix(""))
+                        selections.append((name, read_coordinates(zip_f.read(info), pqr=input_type == "pqr")))
+
+        return selections
+
+    @launchlogger
+    def launch(self) -> int:
+        """Execute the :class:`BoxBatch <utils.box_batch.BoxBatch>` utils.box_batch.BoxBatch object."""
+
+        # check input/output paths and parameters
+        self.check_data_params(self.out_log, self.err_log)
+
+        # Setup Biobb
+        if self.check_restart():
+            return 0
+        self.stage_files()
+
+        fu.log(
+            "Loading selections from %s"
+            % (self.io_dict["in"]["input_selections_path"]),
+            self.out_log,
+            self.global_log,
+        )
+        selections = self.read_selections()
+
+        # selections without atoms have no box
+        for name, coords in selections:
+            if not len(coords):
+                fu.log("Skipping %s selection without atoms" % name, self.out_log)
+        selections = [(name, coords) for name, coords in selections if len(coords)]
+        if not selections:
+            fu.log(
+                self.__class__.__name__ + ": No selections found in %s, exiting"
+                % self.io_dict["in"]["input_selections_path"],
+                self.out_log,
+            )
+            raise SystemExit(
+                self.__class__.__name__ + ": No selections found in %s"
+                % self.io_dict["in"]["input_selections_path"]
+            )
+
+        # all the selections as consecutive segments of a single array
+        names = [name for name, _ in selections]
+        num_atoms = np.array([len(coords) for _, coords in selections])
+        starts = np.concatenate(([0], np.cumsum(num_atoms)[:-1]))
+        coords = np.concatenate([coords for _, coords in selections])
+        fu.log(
+            "Computing the boxes of %d selections from %d atoms"
+            % (len(names), len(coords)),
+            self.out_log,
+            self.global_log,
+        )
+
+        # compute boxes centers and sizes, as the box building block does for a single selection
+        boxes_center = np.add.reduceat(coords, starts) / num_atoms[:, np.newaxis]
+        boxes_size = np.maximum.reduceat(coords, starts) - boxes_center
+        if self.offset:
+            fu.log(
+                "Adding %.1f Angstroms offset" % (self.offset),
+                self.out_log,
+                self.global_log,
+            )
+            boxes_size += self.offset
+        boxes_volume = np.prod(boxes_size, axis=1) * 2**3
+
+        with open(self.io_dict["out"]["output_boxes_path"], "w", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(["name", "num_atoms", "center_x", "center_y", "center_z", "size_x", "size_y", "size_z", "volume"])
+            for name, n, center, size, vol in zip(names, num_atoms, boxes_center, boxes_size, boxes_volume):
+                writer.writerow([name, n] + ["%.3f" % v for v in center] + ["%.3f" % v for v in size] + ["%.0f" % vol])
+
+        fu.log(
+            "Saving output CSV file (with boxes settings): %s"
+            % (self.io_dict["out"]["output_boxes_path"]),
+            self.out_log,
+            self.global_log,
+        )
+
+        # add (optional) one PDB per box with its details as PDB remarks
+        if self.io_dict["out"]["output_boxes_zip"]:
+            with zipfile.ZipFile(self.io_dict["out"]["output_boxes_zip"], "w", zipfile.ZIP_DEFLATED) as zip_out:
+                for name, center, size in zip(names, boxes_center, boxes_size):
+                    remarks = "REMARK BOX CENTER:%10.3f%10.3f%10.3f" % tuple(center)
+                    remarks += " SIZE:%10.3f%10.3f%10.3f" % tuple(size)
+                    box_coords_txt = ""
+                    if self.box_coordinates:
+                        box_coords_txt = get_box_coordinates(center, size)
+                    zip_out.writestr(name + "_box.pdb", remarks + "\n" + box_coords_txt)
+
+            fu.log(
+                "Saving output zip file (with box setting annotations): %s"
+                % (self.io_dict["out"]["output_boxes_zip"]),
+                self.out_log,
+                self.global_log,
+            )
+
+        # Copy files to host
+        self.copy_to_host()
+        self.remove_tmp_files()
+
+        self.check_arguments(output_files_created=True, raise_exception=False)
+
+        return 0
+
+
+def box_batch(
+    input_selections_path: str,
+    output_boxes_path: str,
+    output_boxes_zip: Optional[str] = None,
+    properties: Optional[dict] = None,
+    **kwargs,
+) -> int:
+    """Create the :class:`BoxBatch <utils.box_batch.BoxBatch>` class and
+    execute the :meth:`launch() <utils.box_batch.BoxBatch.launch>` method."""
+    return BoxBatch(**dict(locals())).launch()
+
+
+box_batch.__doc__ = BoxBatch.__doc__
+main = BoxBatch.get_main(box_batch, "Sets the center and the size of a rectangular parallelepiped box around every PDB residues selection or PQR pocket of a given zip file or directory, all of them computed at once.")
+
+
+if __name__ == "__main__":
+    main()
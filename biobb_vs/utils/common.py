@@ -1,15 +1,25 @@
 """Common functions for package biobb_vs.utils"""
 
+import csv
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
 import warnings
+from io import StringIO
 from pathlib import Path, PurePath
 from typing import Optional, Union
 
+import numpy as np
 from Bio import BiopythonDeprecationWarning
 from biobb_common.tools import file_utils as fu
 
 with warnings.catch_warnings():
     warnings.simplefilter("ignore", BiopythonDeprecationWarning)
-    import Bio.pairwise2
+    import Bio.Align.substitution_matrices
     import Bio.PDB
 
     try:
@@ -23,13 +33,13 @@ with warnings.catch_warnings():
 # CHECK PARAMETERS
 
 
-def check_input_path(path, argument, out_log, classname):
-    """Checks input file"""
+def check_input_path(path, argument, out_log, classname, formats=None):
+    """Checks input file, against the given formats instead of those of the argument if provided"""
     if not Path(path).exists():
         fu.log(classname + ": Unexisting %s file, exiting" % argument, out_log)
         raise SystemExit(classname + ": Unexisting %s file" % argument)
     file_extension = PurePath(path).suffix
-    if not is_valid_file(file_extension[1:], argument):
+    if not is_valid_file(file_extension[1:], argument, formats):
         fu.log(
             classname + ": Format %s in %s file is not compatible"
             % (file_extension[1:], argument),
@@ -42,15 +52,15 @@ def check_input_path(path, argument, out_log, classname):
     return path
 
 
-def check_output_path(path, argument, optional, out_log, classname):
-    """Checks output file"""
+def check_output_path(path, argument, optional, out_log, classname, formats=None):
+    """Checks output file, against the given formats instead of those of the argument if provided"""
     if optional and not path:
         return None
     if PurePath(path).parent and not Path(PurePath(path).parent).exists():
         fu.log(classname + ": Unexisting  %s folder, exiting" % argument, out_log)
         raise SystemExit(classname + ": Unexisting  %s folder" % argument)
     file_extension = PurePath(path).suffix
-    if not is_valid_file(file_extension[1:], argument):
+    if not is_valid_file(file_extension[1:], argument, formats):
         fu.log(
             classname + ": Format %s in  %s file is not compatible"
             % (file_extension[1:], argument),
@@ -63,14 +73,20 @@ def check_output_path(path, argument, optional, out_log, classname):
     return path
 
 
-def is_valid_file(ext, argument):
+def is_valid_file(ext, argument, formats=None):
     """Checks if file format is compatible"""
+    if formats is not None:
+        return ext in formats
     formats = {
         "input_pdb_path": ["pdb", "pqr"],
         "input_clusters_zip": ["zip"],
+        "input_selections_path": ["zip"],
         "resid_pdb_path": ["pdb"],
         "input_pdbqt_path": ["pdbqt"],
         "output_pdb_path": ["pdb"],
+        "output_occupancy_path": ["json"],
+        "output_boxes_path": ["csv"],
+        "output_boxes_zip": ["zip"],
         "output_pdbqt_path": ["pdbqt"],
     }
     return ext in formats[argument]
@@ -79,7 +95,26 @@ def is_valid_file(ext, argument):
 # UTILS FUNCTIONS
 
 
-def get_residue_by_id(structure, res_num):
+def get_residue_index(structure):
+    """
+    Returns the residues of the structure by residue number, only the first residue of each number is kept.
+    """
+
+    residue_index = {}
+    for residue in structure.get_residues():
+        residue_index.setdefault(residue.get_id()[1], residue)
+    return residue_index
+
+
+def get_residue_by_id(structure, res_num, residue_index=None):
+    """
+    Returns the first residue of the structure numbered res_num, None if there is none.
+    Lookups in a loop should pass the residue_index of the structure built once with get_residue_index.
+    """
+
+    if residue_index is not None:
+        return residue_index.get(res_num)
+
     for residue in structure.get_residues():
         if residue.get_id()[1] == res_num:
             return residue
@@ -110,8 +145,72 @@ def get_sequence_nucs(structure):
     return seq
 
 
+@functools.lru_cache(maxsize=None)
+def get_pairwise_aligner(matrix_name="BLOSUM62", gap_open=-10.0, gap_extend=-0.5):
+    """
+    Returns a global pairwise aligner with the matrix_name substitution matrix and the given gap penalties, not penalizing end gaps.
+    The substitution matrix is loaded only once per process.
+    """
+
+    aligner = Bio.Align.PairwiseAligner()
+    aligner.mode = "global"
+    aligner.substitution_matrix = Bio.Align.substitution_matrices.load(matrix_name)
+    aligner.open_gap_score = gap_open
+    aligner.extend_gap_score = gap_extend
+    aligner.end_gap_score = 0
+
+    return aligner
+
+
+def get_alignment_key(sequence_A, sequence_B, matrix_name, gap_open, gap_extend):
+    """
+    Returns the key of the alignment of two sequences with the given substitution matrix and gap penalties.
+    """
+
+    params = [sequence_A, sequence_B, matrix_name, float(gap_open), float(gap_extend)]
+    return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=1024)
+def align_sequence_strings(
+    sequence_A, sequence_B, matrix_name="BLOSUM62", gap_open=-10.0, gap_extend=-0.5, cache_path=None
+):
+    """
+    Performs a global pairwise alignment between two sequence strings and returns both aligned strings and the aligned blocks.
+    Only the first optimal alignment is computed: its score is the one of Bio.pairwise2, but when several optimal alignments tie,
+    which is frequent between sequences with many indels, it may be a different one than the first of Bio.pairwise2.
+    Alignments are memoized in-process and, if cache_path is given, stored in that folder to be reused by other runs.
+    """
+
+    entry = None
+    if cache_path:
+        key = get_alignment_key(sequence_A, sequence_B, matrix_name, gap_open, gap_extend)
+        entry = Path(cache_path).joinpath(key + ".json")
+        try:
+            with open(entry) as f:
+                aligned_A, aligned_B, blocks = json.load(f)
+            return aligned_A, aligned_B, blocks
+        except (OSError, ValueError):
+            pass
+
+    # Do pairwise alignment, computing only the first optimal alignment
+    aligner = get_pairwise_aligner(matrix_name, float(gap_open), float(gap_extend))
+    best_aln = aligner.align(sequence_A, sequence_B)[0]
+    aligned_A, aligned_B, blocks = best_aln[0], best_aln[1], best_aln.aligned.tolist()
+
+    if entry:
+        # write the entry aside and move it in place so concurrent runs never see it half written
+        Path(cache_path).mkdir(parents=True, exist_ok=True)
+        fd, tmp_entry = tempfile.mkstemp(prefix="." + entry.stem, dir=cache_path)
+        with os.fdopen(fd, "w") as f:
+            json.dump([aligned_A, aligned_B, blocks], f)
+        os.replace(tmp_entry, entry)
+
+    return aligned_A, aligned_B, blocks
+
+
 def align_sequences(
-    seqA, seqB, matrix_name="BLOSUM62", gap_open=-10.0, gap_extend=-0.5
+    seqA, seqB, matrix_name="BLOSUM62", gap_open=-10.0, gap_extend=-0.5, cache_path=None
 ):
     """
     Performs a global pairwise alignment between two sequences using the Needleman-Wunsch algorithm as implemented in Biopython.
@@ -122,46 +221,15 @@ def align_sequences(
     sequence_A = "".join([i[1] for i in seqA])
     sequence_B = "".join([i[1] for i in seqB])
 
-    # get matrix from matrix_name
-    # try:
-    #   matrix = getattr(Bio.SubsMat.MatrixInfo, matrix_name)
-    # except AttributeError:
-
-    matrix = Bio.Align.substitution_matrices.load(matrix_name)
-
-    # print(Bio.SubsMat.MatrixInfo)
-    # print(type(substitution_matrices.select()))
-    # matrix = getattr(substitution_matrices.load(), matrix_name)
-
-    # Do pairwaise alignment
-    alns = Bio.pairwise2.align.globalds(
-        sequence_A,
-        sequence_B,
-        matrix,
-        gap_open,
-        gap_extend,
-        penalize_end_gaps=(False, False),
+    aligned_A, aligned_B, blocks = align_sequence_strings(
+        sequence_A, sequence_B, matrix_name, float(gap_open), float(gap_extend), cache_path
     )
 
-    best_aln = alns[0]
-    aligned_A, aligned_B, score, begin, end = best_aln
-
     # Equivalent residue numbering. Relative to reference
     mapping = {}
-    aa_i_A, aa_i_B = 0, 0
-    for aln_i, (aa_aln_A, aa_aln_B) in enumerate(zip(aligned_A, aligned_B)):
-        if aa_aln_A == "-":
-            if aa_aln_B != "-":
-                aa_i_B += 1
-        elif aa_aln_B == "-":
-            if aa_aln_A != "-":
-                aa_i_A += 1
-        else:
-            assert seqA[aa_i_A][1] == aa_aln_A
-            assert seqB[aa_i_B][1] == aa_aln_B
+    for (start_A, end_A), (start_B, end_B) in zip(*blocks):
+        for aa_i_A, aa_i_B in zip(range(start_A, end_A), range(start_B, end_B)):
             mapping[seqA[aa_i_A][0]] = seqB[aa_i_B][0]
-            aa_i_A += 1
-            aa_i_B += 1
 
     return ((aligned_A, aligned_B), mapping)
 
@@ -180,12 +248,89 @@ def calculate_alignment_identity(alignedA, alignedB):
     return (seq_id, gap_id)
 
 
+class HetGroupIndex:
+    """
+    Immutable classification of het group codes into water, ion, modres or ligand, answering in O(1).
+    Codes not in the index are ligands.
+    """
+
+    WATER = "water"
+    ION = "ion"
+    MODRES = "modres"
+    LIGAND = "ligand"
+    CLASSES = (WATER, ION, MODRES, LIGAND)
+
+    __slots__ = ("_classes",)
+
+    def __init__(self, classes):
+        object.__setattr__(self, "_classes", dict(classes))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("HetGroupIndex is immutable")
+
+    def __len__(self):
+        return len(self._classes)
+
+    def classify(self, resname):
+        """Returns the class of the resname het group"""
+        return self._classes.get(resname.strip(), self.LIGAND)
+
+    def is_water(self, resname):
+        return self.classify(resname) == self.WATER
+
+    def is_ion(self, resname):
+        return self.classify(resname) == self.ION
+
+    def is_modres(self, resname):
+        return self.classify(resname) == self.MODRES
+
+    def is_ligand(self, resname):
+        return self.classify(resname) == self.LIGAND
+
+    def extend(self, classes):
+        """Returns a new index with the classes of the given het group codes added or replaced"""
+        merged = dict(self._classes)
+        merged.update(classes)
+        return HetGroupIndex(merged)
+
+
+def read_het_group_table(table_path):
+    """
+    Reads a CSV table with a het group code and its class (water, ion, modres or ligand) per row, ie: derived from the Chemical Component Dictionary.
+    Rows starting with # are ignored.
+    """
+
+    classes = {}
+    with open(table_path, newline="") as table:
+        for row in csv.reader(table):
+            if not row or row[0].startswith("#"):
+                continue
+            if len(row) < 2 or row[1].strip().lower() not in HetGroupIndex.CLASSES:
+                raise ValueError("wrong row %s" % ",".join(row))
+            classes[row[0].strip().upper()] = row[1].strip().lower()
+
+    return classes
+
+
+@functools.lru_cache(maxsize=None)
+def get_het_group_index(table_path=None):
+    """
+    Returns the built-in het groups index, extended with the table_path CSV table if given. Each index is built once per process.
+    """
+
+    if not table_path:
+        return HET_GROUPS
+
+    return HET_GROUPS.extend(read_het_group_table(table_path))
+
+
 def get_ligand_residues(
     PDBchain,
     ignore_wats=True,
     ignore_small_molec=True,
     ignore_ions=True,
     ignore_modres=True,
+    het_groups=None,
 ):
     """
     Returns heteroatoms residues.
@@ -195,8 +340,12 @@ def get_ligand_residues(
         ignore_small_molec (boolean): If True, small ligands (< 5 atoms) will be skipped, and not returned as ligand residues
         ignore_ions (boolean): If True, ion residues will be skipped, and not returned as ligand residues
         ignore_modres (boolean): If True, modified aminoa acid residues will be skipped, and not returned as ligand residues
+        het_groups (HetGroupIndex): Classification of the het groups, the built-in one if not provided
     """
 
+    if het_groups is None:
+        het_groups = HET_GROUPS
+
     # small_molec_atoms_min = 5
     ligands = []
 
@@ -208,8 +357,10 @@ def get_ligand_residues(
         if res_hetflag == " ":
             continue
 
+        het_class = het_groups.classify(res.get_resname())
+
         # skip waters, if defined
-        if res_hetflag == "W":
+        if res_hetflag == "W" or het_class == HetGroupIndex.WATER:
             if not ignore_wats:
                 ligands.append(res)
             continue
@@ -219,11 +370,11 @@ def get_ligand_residues(
         #            continue
         # skip ions
         if ignore_ions:
-            if res.get_resname().strip() in __ions():
+            if het_class == HetGroupIndex.ION:
                 continue
         # skip modres
         if ignore_modres:
-            if res.get_resname().strip() in __modres().keys():
+            if het_class == HetGroupIndex.MODRES:
                 continue
 
         # add as ligand
@@ -232,6 +383,239 @@ def get_ligand_residues(
     return ligands
 
 
+def get_ligand_resnames(pdb_data, het_groups=None):
+    """
+    Returns the names of the candidate ligand residues found in the HETATM records of the first model of a PDB file contents (bytes),
+    as get_ligand_residues would select them with its default arguments in any chain, without building the structure.
+    Members where this set is empty, or lacks the requested ligand, can be discarded before parsing them.
+    """
+
+    if het_groups is None:
+        het_groups = HET_GROUPS
+
+    # only the first model is parsed
+    end = pdb_data.find(b"\nENDMDL")
+    if end != -1:
+        pdb_data = pdb_data[:end]
+
+    resnames = set()
+    for resname in set(HETATM_RESNAME_RE.findall(pdb_data)):
+        resname = resname.strip().decode("latin-1")
+        # skip waters, ions and modres
+        if resname in ("HOH", "WAT") or not het_groups.is_ligand(resname):
+            continue
+        resnames.add(resname)
+
+    return resnames
+
+
+def read_pqr_records(pdb_data):
+    """
+    Returns the (N, 5) float array with the x, y, z, charge and radius fields of the ATOM and HETATM records of a PQR file contents (bytes),
+    the last five whitespace-delimited fields of each record, as PQR files do not have fixed columns.
+    """
+
+    fields = b" ".join([b" ".join(record.rsplit(None, 5)[1:]) for record in PQR_RECORD_RE.findall(pdb_data)])
+    return np.array(fields.split(), dtype=np.float64).reshape(-1, 5)
+
+
+def read_coordinates(pdb_data, pqr=False):
+    """
+    Returns the (N, 3) float array with the coordinates of the ATOM and HETATM records of a PDB file contents (bytes), read in one pass
+    from their fixed columns (31-38, 39-46 and 47-54), or of a PQR file contents, read with read_pqr_records, if pqr is True.
+    """
+
+    if pqr:
+        return read_pqr_records(pdb_data)[:, :3]
+
+    coords = b"".join(PDB_COORDINATES_RE.findall(pdb_data))
+    return np.frombuffer(coords, dtype="S8").astype(np.float64).reshape(-1, 3)
+
+
+# arrays of a parsed cluster member, see parse_cluster_member
+CLUSTER_MEMBER_ARRAYS = (
+    "seq_resnums",
+    "seq_letters",
+    "res_nums",
+    "res_ca",
+    "het_resnames",
+    "het_waters",
+    "het_atoms",
+    "het_coords",
+)
+
+
+def parse_cluster_member(pdb_data, name):
+    """
+    Parses the chain of a cluster member PDB file contents (bytes) used to superimpose it, the last one of the first model, into plain arrays:
+    its amino acid sequence (seq_resnums, seq_letters), the CA coordinates of its residues by number (res_nums, res_ca, NaN if missing)
+    and the names, water flags, number of atoms and concatenated atom coordinates of its het groups (het_resnames, het_waters, het_atoms, het_coords).
+    """
+
+    model = Bio.PDB.PDBParser(QUIET=True).get_structure(name, StringIO(pdb_data.decode("utf-8")))[0]
+    chain = model
+    for chain in model.get_chains():
+        pass
+
+    sequence = get_pdb_sequence(chain)
+    residue_index = get_residue_index(chain)
+    het_residues = [res for res in chain.get_residues() if res.get_id()[0] != " "]
+
+    return {
+        "seq_resnums": np.array([res_num for res_num, _ in sequence], dtype=np.int64),
+        "seq_letters": np.array([letter for _, letter in sequence], dtype="U1"),
+        "res_nums": np.array(list(residue_index), dtype=np.int64),
+        "res_ca": np.array(
+            [res["CA"].get_coord() if "CA" in res else [np.nan] * 3 for res in residue_index.values()], dtype=np.float32
+        ).reshape(-1, 3),
+        "het_resnames": np.array([res.get_resname() for res in het_residues], dtype=str),
+        "het_waters": np.array([res.get_id()[0] == "W" for res in het_residues], dtype=bool),
+        "het_atoms": np.array([len(res) for res in het_residues], dtype=np.int64),
+        "het_coords": np.array([atom.get_coord() for res in het_residues for atom in res], dtype=np.float32).reshape(-1, 3),
+    }
+
+
+def load_cluster_member(pdb_data, name, cache_path=None):
+    """
+    Returns the arrays of a cluster member PDB file contents (bytes) as parse_cluster_member does.
+    If cache_path is given, members are stored there by content hash as a folder of .npy files and memory-mapped when found again.
+    """
+
+    entry = None
+    if cache_path:
+        entry = Path(cache_path).joinpath(hashlib.sha256(pdb_data).hexdigest() + ".member")
+        try:
+            return {key: np.load(entry.joinpath(key + ".npy"), mmap_mode="r") for key in CLUSTER_MEMBER_ARRAYS}
+        except (OSError, ValueError):
+            pass
+
+    arrays = parse_cluster_member(pdb_data, name)
+
+    if entry:
+        # write the entry aside and move it in place so concurrent runs never see it half written
+        Path(cache_path).mkdir(parents=True, exist_ok=True)
+        tmp_entry = tempfile.mkdtemp(prefix="." + entry.stem, dir=cache_path)
+        for key, array in arrays.items():
+            np.save(Path(tmp_entry).joinpath(key + ".npy"), array)
+        try:
+            os.replace(tmp_entry, entry)
+        except OSError:
+            # already stored by a concurrent run
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    return arrays
+
+
+def _concatenate_ranges(starts, counts):
+    """
+    Returns the concatenation of the ranges of integers of the given starts and lengths.
+    """
+
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+
+# offsets to a grid cell and its 26 neighbours
+GRID_NEIGHBOUR_OFFSETS = np.array(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing="ij")).reshape(3, -1).T
+
+
+def search_neighbor_pairs(atom_coords, query_coords, radius):
+    """
+    Returns the indices of the atom_coords and query_coords pairs closer than radius, as two arrays.
+    All the queries are searched at once: the atoms inside the bounding box of the queries enlarged by radius are binned in a grid
+    of radius wide cells and every distinct query is compared to the atoms of its cell and the 26 neighbouring ones.
+    """
+
+    atom_coords = np.asarray(atom_coords, dtype=np.float64).reshape(-1, 3)
+    query_coords = np.asarray(query_coords, dtype=np.float64).reshape(-1, 3)
+    if not len(atom_coords) or not len(query_coords):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # prune the atoms out of the queries bounding box
+    radius = float(radius)
+    lower = query_coords.min(axis=0) - radius
+    upper = query_coords.max(axis=0) + radius
+    candidates = np.flatnonzero(np.all((atom_coords >= lower) & (atom_coords <= upper), axis=1))
+    if not len(candidates):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # identical queries (ie: superimposed copies of a ligand) are searched once
+    unique_queries, query_of_unique = np.unique(query_coords, axis=0, return_inverse=True)
+    query_of_unique = query_of_unique.reshape(-1)
+
+    # candidate atoms sorted by grid cell
+    cell_size = max(radius, 1e-3)
+    shape = np.floor((upper - lower) / cell_size).astype(np.int64) + 1
+    atom_cells = np.ravel_multi_index(np.floor((atom_coords[candidates] - lower) / cell_size).astype(np.int64).T, shape)
+    atom_order = np.argsort(atom_cells, kind="stable")
+    atom_cells = atom_cells[atom_order]
+
+    # atoms of the cells around every query
+    neighbour_cells = np.floor((unique_queries - lower) / cell_size).astype(np.int64)[:, None, :] + GRID_NEIGHBOUR_OFFSETS
+    query_indices, offset_indices = np.nonzero(np.all((neighbour_cells >= 0) & (neighbour_cells < shape), axis=2))
+    neighbour_cells = np.ravel_multi_index(neighbour_cells[query_indices, offset_indices].T, shape)
+    starts = np.searchsorted(atom_cells, neighbour_cells, side="left")
+    counts = np.searchsorted(atom_cells, neighbour_cells, side="right") - starts
+    query_indices = np.repeat(query_indices, counts)
+    atom_indices = candidates[atom_order[_concatenate_ranges(starts, counts)]]
+    close = np.sqrt(np.sum((atom_coords[atom_indices] - unique_queries[query_indices]) ** 2, axis=1)) <= radius
+    atom_indices, query_indices = atom_indices[close], query_indices[close]
+
+    # expand every distinct query back to all its copies
+    query_order = np.argsort(query_of_unique, kind="stable")
+    copies = np.bincount(query_of_unique, minlength=len(unique_queries))
+    first_copy = np.cumsum(copies) - copies
+    counts = copies[query_indices]
+
+    return np.repeat(atom_indices, counts), query_order[_concatenate_ranges(first_copy[query_indices], counts)]
+
+
+def search_neighbor_atoms(atom_coords, query_coords, radius):
+    """
+    Returns the boolean mask of the atom_coords within radius of any of the query_coords.
+    """
+
+    mask = np.zeros(len(atom_coords), dtype=bool)
+    atom_indices, _ = search_neighbor_pairs(atom_coords, query_coords, radius)
+    mask[atom_indices] = True
+
+    return mask
+
+
+def superimpose_coordinates(fixed_coords, moving_coords):
+    """
+    Superimposes every array of moving_coords onto the paired array of fixed_coords with a batched Kabsch algorithm.
+    Returns the rotation matrices, the translation vectors and the RMSD of every pair, following the Bio.SVDSuperimposer
+    convention: the moving coordinates are superimposed as dot(coords, rot) + tran.
+    """
+
+    lengths = np.array([len(coords) for coords in moving_coords], dtype=np.int64)
+    if not len(lengths):
+        return np.empty((0, 3, 3)), np.empty((0, 3)), np.empty(0)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    pair = np.repeat(np.arange(len(lengths)), lengths)
+    fixed = np.concatenate(fixed_coords).astype(np.float64).reshape(-1, 3)
+    moving = np.concatenate(moving_coords).astype(np.float64).reshape(-1, 3)
+
+    # centre each pair of coordinate sets on its centroid
+    fixed_centre = np.add.reduceat(fixed, starts) / lengths[:, np.newaxis]
+    moving_centre = np.add.reduceat(moving, starts) / lengths[:, np.newaxis]
+    fixed_centred = fixed - fixed_centre[pair]
+    moving_centred = moving - moving_centre[pair]
+
+    # one 3x3 correlation matrix and one SVD per pair, all at once
+    correlation = np.add.reduceat(moving_centred[:, :, np.newaxis] * fixed_centred[:, np.newaxis, :], starts)
+    u, _, vt = np.linalg.svd(correlation)
+    # turn reflections into proper rotations
+    vt[np.linalg.det(np.matmul(u, vt)) < 0, 2] *= -1
+    rot = np.matmul(u, vt)
+    tran = fixed_centre - np.einsum("ij,ijk->ik", moving_centre, rot)
+
+    diff = np.einsum("ij,ijk->ik", moving, rot[pair]) + tran[pair] - fixed
+    rms = np.sqrt(np.add.reduceat((diff * diff).sum(axis=1), starts) / lengths)
+
+    return rot, tran, rms
+
+
 def get_box_coordinates(box_center, box_size, pdb_format=True):
     coords = [
         [
@@ -980,6 +1364,23 @@ def __modres():
     }
 
 
+# built-in het groups classification, built once
+HET_GROUPS = HetGroupIndex(
+    [("HOH", HetGroupIndex.WATER), ("WAT", HetGroupIndex.WATER)]
+    + [(code, HetGroupIndex.ION) for code in __ions()]
+    + [(code, HetGroupIndex.MODRES) for code in __modres()]
+)
+
+# residue name of the HETATM records
+HETATM_RESNAME_RE = re.compile(rb"^HETATM.{11}(.{3})", re.MULTILINE)
+
+# coordinates columns of the ATOM and HETATM records of a PDB file
+PDB_COORDINATES_RE = re.compile(rb"^(?=ATOM|HETATM).{30}(.{24})", re.MULTILINE)
+
+# ATOM and HETATM records of a PQR file
+PQR_RECORD_RE = re.compile(rb"^(?:ATOM|HETATM).*$", re.MULTILINE)
+
+
 # TODO: Move this function to biobb_common.tools.file_utils
 def _from_string_to_list(input_data: Optional[Union[str, list[str]]]) -> list[str]:
     """
@@ -26,9 +26,14 @@ setuptools.setup(
             "fpocket_filter = biobb_vs.fpocket.fpocket_filter:main",
             "fpocket_run = biobb_vs.fpocket.fpocket_run:main",
             "fpocket_select = biobb_vs.fpocket.fpocket_select:main",
+            "fpocket_query = biobb_vs.fpocket.fpocket_query:main",
+            "fpocket_ensemble = biobb_vs.fpocket.fpocket_ensemble:main",
+            "fpocket_geometry = biobb_vs.fpocket.fpocket_geometry:main",
+            "fpocket_sweep = biobb_vs.fpocket.fpocket_sweep:main",
             "bindingsite = biobb_vs.utils.bindingsite:main",
             "box_residues = biobb_vs.utils.box_residues:main",
             "box = biobb_vs.utils.box:main",
+            "box_batch = biobb_vs.utils.box_batch:main",
             "extract_model_pdbqt = biobb_vs.utils.extract_model_pdbqt:main",
             "autodock_vina_run = biobb_vs.vina.autodock_vina_run:main",
         ]